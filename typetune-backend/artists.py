@@ -0,0 +1,53 @@
+import os
+import asyncio
+from typing import Dict, List, Optional
+
+import upstream
+from cache import CACHE_BACKEND, make_cache
+
+# --- SPOTIFY ARTIST METADATA CACHE ---
+# Artist genres/popularity/images are global and change slowly, so they are
+# cached across users. Only cache-missing ids are sent to Spotify, in batches
+# of up to 50 (the /v1/artists limit).
+
+ARTIST_CACHE_BACKEND = os.getenv("ARTIST_CACHE_BACKEND", CACHE_BACKEND)
+ARTIST_CACHE_TTL = float(os.getenv("ARTIST_CACHE_TTL", str(24 * 3600)))
+ARTIST_CACHE_MAX_ENTRIES = int(os.getenv("ARTIST_CACHE_MAX_ENTRIES", "20000"))
+SPOTIFY_ARTIST_BATCH_SIZE = 50
+
+artist_cache = make_cache("artist", ARTIST_CACHE_TTL, ARTIST_CACHE_MAX_ENTRIES, backend=ARTIST_CACHE_BACKEND)
+
+
+def artist_record(artist: Dict) -> Dict:
+    images = artist.get("images") or []
+    return {
+        "id": artist["id"],
+        "name": artist.get("name"),
+        "genres": artist.get("genres", []),
+        "popularity": artist.get("popularity", 0),
+        "image": images[0].get("url") if images else None,
+        "spotify_url": artist.get("external_urls", {}).get("spotify"),
+    }
+
+
+async def get_artists(artist_ids: List[str], token: str) -> Dict[str, Dict]:
+    unique_ids = list(dict.fromkeys(i for i in artist_ids if i))
+    cached = await asyncio.gather(*(artist_cache.get(artist_id) for artist_id in unique_ids))
+    records = {artist_id: record for artist_id, record in zip(unique_ids, cached) if record is not None}
+
+    missing = [artist_id for artist_id in unique_ids if artist_id not in records]
+    for start in range(0, len(missing), SPOTIFY_ARTIST_BATCH_SIZE):
+        batch = missing[start:start + SPOTIFY_ARTIST_BATCH_SIZE]
+        res = await upstream.spotify_get("/artists", token, params={"ids": ",".join(batch)})
+        res.raise_for_status()
+        for artist in res.json().get("artists", []):
+            if not artist:
+                continue
+            record = artist_record(artist)
+            records[record["id"]] = record
+            await artist_cache.set(record["id"], record)
+    return records
+
+
+async def get_artist(artist_id: str, token: str) -> Optional[Dict]:
+    return (await get_artists([artist_id], token)).get(artist_id)
@@ -0,0 +1,219 @@
+import copy
+import itertools
+from typing import Any, Dict, List, Optional
+
+from pymongo.errors import DuplicateKeyError
+
+# --- IN-MEMORY MONGO STAND-IN ---
+# Just enough of pymongo's async collection API for the backend's own queries,
+# so benchmarks can exercise /save-result and /result without a database.
+# Supports equality, $in/$nin/$gt/$gte/$lt/$lte/$exists filters, dotted paths,
+# include/exclude projections, unique indexes and $set/$inc/$setOnInsert.
+
+_MISSING = object()
+
+
+def _get_path(doc: Dict, path: str):
+    value: Any = doc
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def _set_path(doc: Dict, path: str, value):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.setdefault(part, {})
+    doc[parts[-1]] = value
+
+
+def _matches_condition(value, condition) -> bool:
+    if isinstance(condition, dict) and condition and all(k.startswith("$") for k in condition):
+        for op, arg in condition.items():
+            if op == "$in" and value not in arg:
+                return False
+            if op == "$nin" and value in arg:
+                return False
+            if op == "$exists" and (value is not _MISSING) != bool(arg):
+                return False
+            if op in ("$gt", "$gte", "$lt", "$lte"):
+                if value is _MISSING or value is None:
+                    return False
+                if op == "$gt" and not value > arg:
+                    return False
+                if op == "$gte" and not value >= arg:
+                    return False
+                if op == "$lt" and not value < arg:
+                    return False
+                if op == "$lte" and not value <= arg:
+                    return False
+        return True
+    return value == condition
+
+
+def _matches(doc: Dict, query: Optional[Dict]) -> bool:
+    return all(_matches_condition(_get_path(doc, key), cond) for key, cond in (query or {}).items())
+
+
+def _project(doc: Dict, projection: Optional[Dict]) -> Dict:
+    doc = copy.deepcopy(doc)
+    if not projection:
+        return doc
+    include = [key for key, value in projection.items() if value and key != "_id"]
+    if include:
+        projected = {key: doc[key] for key in include if key in doc}
+        if projection.get("_id", 1) and "_id" in doc:
+            projected["_id"] = doc["_id"]
+        return projected
+    for key, value in projection.items():
+        if not value:
+            doc.pop(key, None)
+    return doc
+
+
+class MemoryCursor:
+    def __init__(self, docs: List[Dict]):
+        self._docs = docs
+
+    def sort(self, key, direction=1):
+        self._docs.sort(key=lambda d: d.get(key), reverse=direction < 0)
+        return self
+
+    def limit(self, n):
+        if n:
+            self._docs = self._docs[:n]
+        return self
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self._docs:
+            yield doc
+
+    async def to_list(self, length=None):
+        return self._docs[:length] if length else list(self._docs)
+
+
+class MemoryCollection:
+    def __init__(self, name: str):
+        self.name = name
+        self._docs: Dict[Any, Dict] = {}
+        self._unique: List[str] = []
+        self._ids = itertools.count(1)
+
+    def with_options(self, **kwargs):
+        return self
+
+    async def create_index(self, keys, unique=False, **kwargs):
+        if unique and isinstance(keys, str) and keys not in self._unique:
+            self._unique.append(keys)
+        return keys
+
+    def _check_unique(self, doc: Dict, ignore_id=None):
+        for key in self._unique:
+            value = doc.get(key, _MISSING)
+            if value is _MISSING:
+                continue
+            for other_id, other in self._docs.items():
+                if other_id != ignore_id and other.get(key, _MISSING) == value:
+                    raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: {key}")
+
+    async def insert_one(self, doc: Dict):
+        doc.setdefault("_id", next(self._ids))
+        if doc["_id"] in self._docs:
+            raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: _id")
+        self._check_unique(doc)
+        self._docs[doc["_id"]] = copy.deepcopy(doc)
+
+    async def find_one(self, query=None, projection=None, **kwargs):
+        for doc in self._docs.values():
+            if _matches(doc, query):
+                return _project(doc, projection)
+        return None
+
+    def find(self, query=None, projection=None, **kwargs):
+        return MemoryCursor([_project(doc, projection) for doc in self._docs.values() if _matches(doc, query)])
+
+    async def count_documents(self, query=None, **kwargs):
+        return sum(1 for doc in self._docs.values() if _matches(doc, query))
+
+    async def update_one(self, query, update, upsert=False):
+        for doc_id, doc in self._docs.items():
+            if _matches(doc, query):
+                self._apply_update(doc, update, inserting=False)
+                return
+        if upsert:
+            doc = {key: value for key, value in query.items() if not isinstance(value, dict)}
+            self._apply_update(doc, update, inserting=True)
+            await self.insert_one(doc)
+
+    async def replace_one(self, query, replacement, upsert=False):
+        for doc_id, doc in self._docs.items():
+            if _matches(doc, query):
+                self._docs[doc_id] = {"_id": doc_id, **copy.deepcopy(replacement)}
+                return
+        if upsert:
+            doc = {key: value for key, value in query.items() if not isinstance(value, dict)}
+            doc.update(copy.deepcopy(replacement))
+            await self.insert_one(doc)
+
+    async def delete_one(self, query):
+        for doc_id, doc in list(self._docs.items()):
+            if _matches(doc, query):
+                del self._docs[doc_id]
+                return
+
+    async def delete_many(self, query):
+        for doc_id, doc in list(self._docs.items()):
+            if _matches(doc, query):
+                del self._docs[doc_id]
+
+    async def bulk_write(self, requests, ordered=True):
+        for request in requests:
+            # pymongo UpdateOne keeps its arguments in these attributes
+            await self.update_one(request._filter, request._doc, upsert=request._upsert)
+
+    @staticmethod
+    def _apply_update(doc: Dict, update: Dict, inserting: bool):
+        for path, value in update.get("$set", {}).items():
+            _set_path(doc, path, copy.deepcopy(value))
+        if inserting:
+            for path, value in update.get("$setOnInsert", {}).items():
+                _set_path(doc, path, copy.deepcopy(value))
+        for path, amount in update.get("$inc", {}).items():
+            current = _get_path(doc, path)
+            _set_path(doc, path, (0 if current is _MISSING else current) + amount)
+
+
+class MemoryDatabase:
+    def __init__(self):
+        self._collections: Dict[str, MemoryCollection] = {}
+
+    def get_collection(self, name: str, **kwargs) -> MemoryCollection:
+        if name not in self._collections:
+            self._collections[name] = MemoryCollection(name)
+        return self._collections[name]
+
+    def __getitem__(self, name: str) -> MemoryCollection:
+        return self.get_collection(name)
+
+    def __getattr__(self, name: str) -> MemoryCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self.get_collection(name)
+
+
+class MemoryMongoClient:
+    def __init__(self):
+        self._databases: Dict[str, MemoryDatabase] = {}
+
+    def __getitem__(self, name: str) -> MemoryDatabase:
+        if name not in self._databases:
+            self._databases[name] = MemoryDatabase()
+        return self._databases[name]
+
+    async def close(self):
+        pass
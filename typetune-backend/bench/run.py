@@ -0,0 +1,288 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import socket
+import sys
+import time
+from typing import Dict, List
+
+import httpx
+import uvicorn
+
+from bench.stubs import StubConfig, lyrics_app, openrouter_app, spotify_app
+
+# --- OFFLINE BENCHMARK ---
+# Starts local stand-ins for Spotify, SomeRandomAPI and OpenRouter (plus an
+# in-memory Mongo unless --mongo-uri is given), serves the real app with
+# uvicorn and drives its endpoints at fixed concurrency levels.
+#
+#   cd typetune-backend
+#   python -m bench.run --requests 300 --concurrency 1,20 --openrouter-latency 0.5
+#   python -m bench.run --json bench.json                 # save a baseline
+#   python -m bench.run --baseline bench.json --tolerance 0.2   # fail on p95 regressions
+
+SCENARIOS = ["top-tracks", "mbti", "lyrics", "artist-insight", "save-result", "result"]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Offline throughput/latency benchmark for the TypeTune backend")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated subset of: " + ", ".join(SCENARIOS))
+    parser.add_argument("--concurrency", default="1,10,50", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per scenario and level")
+    parser.add_argument("--warmup", type=int, default=10, help="unmeasured requests before each run")
+    parser.add_argument("--track-pool", type=int, default=500, help="distinct track ids for /lyrics and /artist-insight")
+    parser.add_argument("--users", type=int, default=50, help="distinct Spotify users for /top-tracks")
+    for name, latency in (("spotify", 0.05), ("lyrics", 0.15), ("openrouter", 1.0)):
+        parser.add_argument(f"--{name}-latency", type=float, default=latency, help=f"mean {name} stub latency (s)")
+        parser.add_argument(f"--{name}-error-rate", type=float, default=0.0, help=f"fraction of failing {name} calls")
+        parser.add_argument(f"--{name}-error-status", type=int, default=503, help=f"status of failing {name} calls")
+    parser.add_argument("--upstream-rate", type=float, default=1000.0,
+                        help="app-side rate limit (req/s, also the burst) for every upstream; "
+                             "high by default so the app, not its limiter, is measured")
+    parser.add_argument("--upstream-concurrency", type=int, default=256, help="app-side max in-flight calls per upstream")
+    parser.add_argument("--mongo-uri", default=None, help="use a real (local) mongod instead of the in-memory stand-in")
+    parser.add_argument("--json", dest="json_path", default=None, help="write results as JSON")
+    parser.add_argument("--baseline", default=None, help="JSON from an earlier run to compare p95 latency against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p95 regression vs baseline (0.2 = 20%%)")
+    return parser.parse_args()
+
+
+def configure_env(args, ports: Dict[str, int]):
+    # Must run before the app is imported: modules read their config at import
+    os.environ["SPOTIFY_API_BASE"] = f"http://127.0.0.1:{ports['spotify']}/v1"
+    os.environ["SPOTIFY_TOKEN_URL"] = f"http://127.0.0.1:{ports['spotify']}/api/token"
+    os.environ["SOMERANDOMAPI_BASE"] = f"http://127.0.0.1:{ports['lyrics']}"
+    os.environ["OPENROUTER_API_BASE"] = f"http://127.0.0.1:{ports['openrouter']}/api/v1"
+    for name, value in (
+        ("SPOTIPY_CLIENT_ID", "bench"),
+        ("SPOTIPY_CLIENT_SECRET", "bench"),
+        ("SPOTIPY_REDIRECT_URI", "http://127.0.0.1/callback"),
+        ("CACHE_BACKEND", "memory"),
+        ("LOG_LEVEL", "WARNING"),
+    ):
+        os.environ.setdefault(name, value)
+    # Explicit limiter settings, so runs are comparable whatever the defaults
+    for name in ("SPOTIFY", "LYRICS", "OPENROUTER"):
+        os.environ[f"{name}_RATE_LIMIT"] = str(args.upstream_rate)
+        os.environ[f"{name}_BURST"] = str(int(args.upstream_rate))
+        os.environ[f"{name}_MAX_CONCURRENCY"] = str(args.upstream_concurrency)
+    if args.mongo_uri:
+        os.environ["MONGODB_URI"] = args.mongo_uri
+        os.environ["MONGODB_TLS"] = "false"
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def is_degraded(res: httpx.Response) -> bool:
+    # Answered, but throttled (429/503) or with a fallback instead of the
+    # real content: a canned summary, throttled lyrics or a failed stage
+    if res.status_code in (429, 503):
+        return True
+    if res.status_code != 200 or not res.headers.get("content-type", "").startswith("application/json"):
+        return False
+    from main import SUMMARY_UNAVAILABLE_MESSAGE  # imported once configure_env has run
+    body = res.json()
+    if not isinstance(body, dict):
+        return False
+    return bool(body.get("lyrics_throttled") or body.get("errors") or body.get("summary") == SUMMARY_UNAVAILABLE_MESSAGE)
+
+
+def fake_features(seed: int) -> List[Dict]:
+    rng = random.Random(seed)
+    genres = ["pop", "dance pop", "rap", "indie rock", "r&b", "acoustic", "k-pop", "lo-fi"]
+    return [{
+        "popularity": rng.randint(0, 100),
+        "duration_ms": rng.randint(120000, 300000),
+        "artist_popularity": rng.randint(0, 100),
+        "artist_genres": rng.sample(genres, 3),
+    } for _ in range(24)]
+
+
+class Workload:
+    def __init__(self, args):
+        self.args = args
+        self.result_ids: List[str] = []
+
+    def auth(self, i: int) -> Dict:
+        return {"Authorization": f"Bearer user{i % self.args.users}"}
+
+    def track_id(self) -> str:
+        return f"track{random.randrange(self.args.track_pool)}"
+
+    def save_body(self, i: int) -> Dict:
+        # Half the saves repeat an earlier result, like users re-sharing
+        seed = i if i % 2 else i // 2
+        return {
+            "mbti": "INFP",
+            "summary": "bench",
+            "breakdown": {"seed": seed},
+            "tracks_used": [{"track_id": f"track{seed + n}", "track_name": f"Track {n}", "artist_genres": ["pop"]} for n in range(24)],
+            "user": f"user{seed % self.args.users}",
+        }
+
+    async def request(self, client: httpx.AsyncClient, scenario: str, i: int) -> httpx.Response:
+        if scenario == "top-tracks":
+            return await client.get("/top-tracks", headers=self.auth(i))
+        if scenario == "mbti":
+            return await client.post("/mbti", json={"audio_features": fake_features(i)})
+        if scenario == "lyrics":
+            return await client.get(f"/lyrics/{self.track_id()}", headers=self.auth(i))
+        if scenario == "artist-insight":
+            return await client.get(f"/artist-insight/{self.track_id()}", headers=self.auth(i))
+        if scenario == "save-result":
+            res = await client.post("/save-result", json=self.save_body(i))
+            if res.status_code == 200:
+                self.result_ids.append(res.json()["result_id"])
+            return res
+        if scenario == "result":
+            # Shared links are opened in bursts: most reads hit a few ids
+            pool = self.result_ids[:5] if random.random() < 0.8 else self.result_ids
+            return await client.get(f"/result/{random.choice(pool)}")
+        raise ValueError(f"Unknown scenario: {scenario}")
+
+    async def prepare(self, client: httpx.AsyncClient):
+        if not self.result_ids:
+            for i in range(20):
+                await self.request(client, "save-result", i)
+
+
+async def run_level(workload: Workload, client: httpx.AsyncClient, scenario: str, concurrency: int, total: int, record: bool):
+    latencies: List[float] = []
+    errors = 0
+    degraded = 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors, degraded
+        for i in counter:
+            start = time.perf_counter()
+            fallback = False
+            try:
+                res = await workload.request(client, scenario, i)
+                fallback = is_degraded(res)
+                failed = res.status_code >= 500 and not fallback
+            except httpx.HTTPError:
+                failed = True
+            latencies.append(time.perf_counter() - start)
+            errors += failed
+            degraded += fallback
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    if not record:
+        return None
+    latencies.sort()
+    return {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "degraded": degraded,
+        "rps": round(total / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+    }
+
+
+def print_table(results: List[Dict]):
+    header = f"{'scenario':<16}{'conc':>6}{'reqs':>7}{'errors':>8}{'degraded':>10}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['scenario']:<16}{r['concurrency']:>6}{r['requests']:>7}{r['errors']:>8}{r['degraded']:>10}{r['rps']:>9}"
+              f"{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}")
+
+
+def compare(results: List[Dict], baseline_path: str, tolerance: float) -> List[str]:
+    with open(baseline_path) as f:
+        baseline = {(r["scenario"], r["concurrency"]): r for r in json.load(f)["results"]}
+    regressions = []
+    for r in results:
+        base = baseline.get((r["scenario"], r["concurrency"]))
+        if base and base["p95_ms"] and r["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(
+                f"{r['scenario']} @ {r['concurrency']}: p95 {r['p95_ms']} ms vs baseline {base['p95_ms']} ms"
+            )
+    return regressions
+
+
+async def serve(app, port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", access_log=False))
+    server.install_signal_handlers = lambda: None
+    asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    return server
+
+
+async def main():
+    args = parse_args()
+    ports = {name: free_port() for name in ("spotify", "lyrics", "openrouter", "app")}
+    configure_env(args, ports)
+
+    import main as backend
+    import mongo
+    if not args.mongo_uri:
+        from bench.memory_mongo import MemoryMongoClient
+        mongo._async_client = MemoryMongoClient()
+
+    configs = {
+        name: StubConfig(
+            latency=getattr(args, f"{name}_latency"),
+            error_rate=getattr(args, f"{name}_error_rate"),
+            error_status=getattr(args, f"{name}_error_status"),
+        )
+        for name in ("spotify", "lyrics", "openrouter")
+    }
+    servers = [
+        await serve(spotify_app(configs["spotify"]), ports["spotify"]),
+        await serve(lyrics_app(configs["lyrics"]), ports["lyrics"]),
+        await serve(openrouter_app(configs["openrouter"]), ports["openrouter"]),
+        await serve(backend.app, ports["app"]),
+    ]
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    levels = [int(c) for c in args.concurrency.split(",")]
+    workload = Workload(args)
+    results = []
+    limits = httpx.Limits(max_connections=max(levels) * 2, max_keepalive_connections=max(levels) * 2)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{ports['app']}", timeout=120, limits=limits) as client:
+        await workload.prepare(client)
+        for concurrency in levels:
+            for scenario in scenarios:
+                await run_level(workload, client, scenario, concurrency, args.warmup, record=False)
+                results.append(await run_level(workload, client, scenario, concurrency, args.requests, record=True))
+
+    for server in servers:
+        server.should_exit = True
+    await asyncio.sleep(0.2)
+
+    print_table(results)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.tolerance)
+        if regressions:
+            print("\nRegressions:", *regressions, sep="\n  ")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,157 @@
+import asyncio
+import hashlib
+import json
+import random
+from dataclasses import dataclass
+
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+# --- LOCAL UPSTREAM STAND-INS ---
+# Starlette apps that mimic the parts of Spotify, SomeRandomAPI and OpenRouter
+# the backend uses. Each has its own latency and error rate. Responses are
+# derived from the requested ids, so repeated runs see the same data.
+
+GENRES = [
+    "pop", "dance pop", "k-pop", "indie rock", "modern rock", "rap", "trap",
+    "r&b", "soul", "edm", "lo-fi", "acoustic", "classical", "alt z", "neo mellow",
+]
+LYRICS_TEXT = "\n".join(
+    ["[Verse 1]", "Walking down the empty street", "Counting every heartbeat"]
+    + ["[Chorus]", "Oh we keep on running", "Oh we keep on running"] * 3
+)
+SUMMARY_TEXT = (
+    "A reflective track about momentum and memory, pairing restless verses with "
+    "a chorus that keeps circling back on itself."
+)
+
+
+@dataclass
+class StubConfig:
+    latency: float = 0.0
+    error_rate: float = 0.0
+    error_status: int = 503
+
+
+def _seed(value: str) -> int:
+    return int(hashlib.md5(value.encode()).hexdigest()[:8], 16)
+
+
+async def _simulate(config: StubConfig):
+    # Returns an error response (or None) after the configured latency.
+    if config.latency:
+        await asyncio.sleep(config.latency * random.uniform(0.5, 1.5))
+    if config.error_rate and random.random() < config.error_rate:
+        headers = {"Retry-After": "1"} if config.error_status == 429 else None
+        return JSONResponse({"error": "stub failure"}, status_code=config.error_status, headers=headers)
+    return None
+
+
+def fake_artist(artist_id: str) -> dict:
+    seed = _seed(artist_id)
+    return {
+        "id": artist_id,
+        "name": f"Artist {artist_id}",
+        "genres": [GENRES[(seed >> shift) % len(GENRES)] for shift in (0, 4, 8)],
+        "popularity": seed % 100,
+        "images": [{"url": f"https://img.example/{artist_id}.jpg"}],
+        "external_urls": {"spotify": f"https://open.spotify.com/artist/{artist_id}"},
+    }
+
+
+def fake_track(track_id: str) -> dict:
+    seed = _seed(track_id)
+    artist_id = f"artist{seed % 40}"
+    return {
+        "id": track_id,
+        "name": f"Track {track_id}",
+        "duration_ms": 150000 + seed % 120000,
+        "popularity": seed % 100,
+        "explicit": bool(seed & 1),
+        "album": {
+            "name": f"Album {seed % 500}",
+            "images": [{"url": f"https://img.example/album{seed % 500}.jpg"}],
+            "release_date": f"{2000 + seed % 25}-01-01",
+        },
+        "artists": [{"id": artist_id, "name": f"Artist {artist_id}"}],
+    }
+
+
+def spotify_app(config: StubConfig) -> Starlette:
+    async def top_tracks(request):
+        error = await _simulate(config)
+        if error:
+            return error
+        limit = int(request.query_params.get("limit", 20))
+        user = request.headers.get("Authorization", "")
+        base = _seed(user) % 1000
+        return JSONResponse({"items": [fake_track(f"track{base + i}") for i in range(limit)]})
+
+    async def track(request):
+        error = await _simulate(config)
+        if error:
+            return error
+        return JSONResponse(fake_track(request.path_params["track_id"]))
+
+    async def artists(request):
+        error = await _simulate(config)
+        if error:
+            return error
+        ids = [i for i in request.query_params.get("ids", "").split(",") if i]
+        return JSONResponse({"artists": [fake_artist(i) for i in ids]})
+
+    async def artist(request):
+        error = await _simulate(config)
+        if error:
+            return error
+        return JSONResponse(fake_artist(request.path_params["artist_id"]))
+
+    async def token(request):
+        error = await _simulate(config)
+        if error:
+            return error
+        return JSONResponse({"access_token": "bench-token", "token_type": "Bearer", "expires_in": 3600})
+
+    return Starlette(routes=[
+        Route("/v1/me/top/tracks", top_tracks),
+        Route("/v1/tracks/{track_id}", track),
+        Route("/v1/artists", artists),
+        Route("/v1/artists/{artist_id}", artist),
+        Route("/api/token", token, methods=["POST"]),
+    ])
+
+
+def lyrics_app(config: StubConfig) -> Starlette:
+    async def lyrics(request):
+        error = await _simulate(config)
+        if error:
+            return error
+        title = request.query_params.get("title", "")
+        # Roughly one track in ten has no lyrics, like instrumentals upstream
+        if _seed(title) % 10 == 0:
+            return JSONResponse({"error": "Sorry I couldn't find that song's lyrics"}, status_code=404)
+        return JSONResponse({"title": title, "author": request.query_params.get("artist"), "lyrics": LYRICS_TEXT})
+
+    return Starlette(routes=[Route("/lyrics", lyrics)])
+
+
+def openrouter_app(config: StubConfig) -> Starlette:
+    async def completions(request):
+        error = await _simulate(config)
+        if error:
+            return error
+        body = await request.json()
+        if body.get("stream"):
+            async def events():
+                for word in SUMMARY_TEXT.split(" "):
+                    chunk = {"choices": [{"delta": {"content": word + " "}}]}
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                yield "data: [DONE]\n\n"
+            return StreamingResponse(events(), media_type="text/event-stream")
+        return JSONResponse({
+            "choices": [{"message": {"role": "assistant", "content": SUMMARY_TEXT}}],
+            "usage": {"prompt_tokens": len(json.dumps(body)) // 4, "completion_tokens": 40},
+        })
+
+    return Starlette(routes=[Route("/api/v1/chat/completions", completions, methods=["POST"])])
@@ -0,0 +1,189 @@
+import os
+import json
+import time
+import asyncio
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional, Union
+
+from metrics import CACHE_REQUESTS
+
+# --- SHARED CACHE BACKENDS ---
+# Small async cache layer used for data that is the same for every user
+# (LLM summaries, lyrics, artist metadata). Values must be JSON-serializable
+# so the in-process, Redis and Mongo backends behave the same. None is never
+# stored: a get() returning None always means "miss".
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory").lower()
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+_redis = None
+
+
+def get_redis():
+    global _redis
+    if _redis is None:
+        import redis.asyncio as redis
+        _redis = redis.from_url(REDIS_URL, decode_responses=True)
+    return _redis
+
+
+async def close_redis():
+    global _redis
+    if _redis is not None:
+        await _redis.aclose()
+        _redis = None
+
+
+class Cache:
+    def __init__(self, namespace: str, ttl: float):
+        self.namespace = namespace
+        self.ttl = ttl
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    async def get(self, key: str) -> Optional[Any]:
+        value = await self._get(key)
+        CACHE_REQUESTS.inc(cache=self.namespace, result="miss" if value is None else "hit")
+        return value
+
+    async def peek(self, key: str) -> Optional[Any]:
+        # Like get() but left out of the hit/miss metrics, for background
+        # checks (e.g. prefetch) that are not user lookups.
+        return await self._get(key)
+
+    async def _get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        raise NotImplementedError
+
+    async def delete(self, key: str):
+        raise NotImplementedError
+
+    # ttl may also be a callable taking the computed value, so callers can give
+    # different kinds of results (e.g. negative entries) their own lifetime.
+    async def get_or_set(self, key: str, compute: Callable[[], Awaitable[Any]],
+                         ttl: Union[float, Callable[[Any], float], None] = None) -> Any:
+        value = await self.get(key)
+        if value is not None:
+            return value
+        # Coalesce concurrent misses: the first caller starts the upstream
+        # call, everyone else awaits the same task. shield() keeps one
+        # disconnected client from cancelling the call for the others.
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._compute_and_store(key, compute, ttl))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _compute_and_store(self, key, compute, ttl):
+        value = await compute()
+        if value is not None:
+            await self.set(key, value, ttl(value) if callable(ttl) else ttl)
+        return value
+
+
+class MemoryCache(Cache):
+    # TTL + LRU eviction in a single OrderedDict, most recently used last.
+    def __init__(self, namespace: str, ttl: float, max_entries: int = 1024):
+        super().__init__(namespace, ttl)
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+
+    async def _get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    async def set(self, key, value, ttl=None):
+        self._data[key] = (time.monotonic() + (ttl or self.ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    async def delete(self, key):
+        self._data.pop(key, None)
+
+
+class RedisCache(Cache):
+    # LRU eviction is left to the Redis server (maxmemory-policy allkeys-lru).
+    # Redis errors are treated as misses so a cache outage never fails a request.
+    def _key(self, key):
+        return f"typetune:{self.namespace}:{key}"
+
+    async def _get(self, key):
+        try:
+            raw = await get_redis().get(self._key(key))
+        except Exception:
+            return None
+        return json.loads(raw) if raw is not None else None
+
+    async def set(self, key, value, ttl=None):
+        try:
+            await get_redis().set(self._key(key), json.dumps(value), ex=int(ttl or self.ttl))
+        except Exception:
+            pass
+
+    async def delete(self, key):
+        try:
+            await get_redis().delete(self._key(key))
+        except Exception:
+            pass
+
+
+class MongoCache(Cache):
+    # One document per key in the "cache_<namespace>" collection. A TTL index on
+    # expires_at lets Mongo purge expired entries; reads also check expires_at
+    # because the TTL monitor only runs about once a minute.
+    def __init__(self, namespace: str, ttl: float):
+        super().__init__(namespace, ttl)
+        self._index_ready = False
+
+    async def _collection(self):
+        from mongo import get_async_db
+        collection = get_async_db()[f"cache_{self.namespace}"]
+        if not self._index_ready:
+            await collection.create_index("expires_at", expireAfterSeconds=0)
+            self._index_ready = True
+        return collection
+
+    async def _get(self, key):
+        try:
+            collection = await self._collection()
+            doc = await collection.find_one({"_id": key, "expires_at": {"$gt": datetime.now(timezone.utc)}})
+        except Exception:
+            return None
+        return doc["value"] if doc else None
+
+    async def set(self, key, value, ttl=None):
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=ttl or self.ttl)
+        try:
+            collection = await self._collection()
+            await collection.replace_one({"_id": key}, {"value": value, "expires_at": expires_at}, upsert=True)
+        except Exception:
+            pass
+
+    async def delete(self, key):
+        try:
+            collection = await self._collection()
+            await collection.delete_one({"_id": key})
+        except Exception:
+            pass
+
+
+def make_cache(namespace: str, ttl: float, max_entries: int = 1024, backend: Optional[str] = None) -> Cache:
+    backend = (backend or CACHE_BACKEND).lower()
+    if backend == "redis":
+        return RedisCache(namespace, ttl)
+    if backend == "mongo":
+        return MongoCache(namespace, ttl)
+    if backend == "memory":
+        return MemoryCache(namespace, ttl, max_entries)
+    raise ValueError(f"Unknown cache backend: {backend}")
@@ -0,0 +1,127 @@
+import os
+from functools import lru_cache
+from typing import Dict, Tuple
+
+# --- GENRE TAXONOMY ---
+# Trait nudges per genre as (E/I, S/N, T/F, J/P): positive values push
+# towards E, S, T and J. Spotify has thousands of genre strings ("modern
+# indie pop", "melodic drill", ...), so the table is compiled once at import
+# into an index of rules, and any genre is resolved to a weight vector by:
+#   1. exact match with a GENRE_TAXONOMY entry (these keep their exact weights)
+#   2. word-phrase match: any taxonomy entry or GENRE_TOKEN_RULES phrase found
+#      as whole words in the genre, longer phrases first
+#   3. substring match with GENRE_SUBSTRING_RULES (compounds like "metalcore")
+# For 2 and 3 each axis is taken from the most specific rule that sets it.
+# Lookups are memoized in a bounded LRU, so each genre is resolved once.
+
+AXES = ("ei", "sn", "tf", "jp")
+
+E_BOOST = 0.03
+S_BOOST = 0.02
+T_SHIFT = 0.04
+J_DELTA = 0.05
+
+GENRE_TAXONOMY = {
+    "dance pop": {"ei": E_BOOST, "jp": J_DELTA},
+    "pop rap": {"ei": E_BOOST},
+    "edm": {"ei": E_BOOST},
+    "acoustic": {"sn": S_BOOST},
+    "rap": {"tf": T_SHIFT},
+    "trap": {"tf": T_SHIFT, "jp": -J_DELTA},
+    "metal": {"tf": T_SHIFT},
+    "r&b": {"tf": -T_SHIFT},
+    "soul": {"tf": -T_SHIFT},
+    "neo mellow": {"tf": -T_SHIFT, "jp": J_DELTA},
+    "ballad": {"tf": -T_SHIFT},
+    "k-ballad": {"tf": -T_SHIFT},
+    "classical": {"jp": J_DELTA},
+    "k-pop": {"jp": J_DELTA},
+    "j-pop": {"jp": J_DELTA},
+    "indie pop": {"jp": J_DELTA},
+    "broadway": {"jp": J_DELTA},
+    "pop": {"jp": J_DELTA},
+    "lo-fi": {"jp": -J_DELTA},
+    "alt z": {"jp": -J_DELTA},
+    "vaporwave": {"jp": -J_DELTA},
+    "indie rock": {"jp": -J_DELTA},
+    "psychedelic rock": {"jp": -J_DELTA},
+}
+
+# Extra whole-word phrases for genres outside the table above
+GENRE_TOKEN_RULES = {
+    "dance": {"ei": E_BOOST},
+    "house": {"ei": E_BOOST},
+    "hip hop": {"tf": T_SHIFT},
+    "drill": {"tf": T_SHIFT},
+    "mellow": {"tf": -T_SHIFT},
+    "folk": {"sn": S_BOOST},
+    "singer-songwriter": {"sn": S_BOOST},
+    "lofi": {"jp": -J_DELTA},
+    "psychedelic": {"jp": -J_DELTA},
+    "jazz": {"jp": -J_DELTA},
+    "jam band": {"jp": -J_DELTA},
+    "orchestra": {"jp": J_DELTA},
+    "musical": {"jp": J_DELTA},
+    "show tunes": {"jp": J_DELTA},
+}
+
+# Matched anywhere in the genre string, for unsplit compounds
+GENRE_SUBSTRING_RULES = {
+    "metal": {"tf": T_SHIFT},
+    "hip-hop": {"tf": T_SHIFT},
+    "trap": {"tf": T_SHIFT},
+    "soul": {"tf": -T_SHIFT},
+    "ballad": {"tf": -T_SHIFT},
+    "lo-fi": {"jp": -J_DELTA},
+    "vaporwave": {"jp": -J_DELTA},
+}
+
+GENRE_INDEX_CACHE_SIZE = int(os.getenv("GENRE_INDEX_CACHE_SIZE", "4096"))
+
+ZERO = (0.0, 0.0, 0.0, 0.0)
+
+
+def normalize_genre(genre: str) -> str:
+    return " ".join((genre or "").casefold().split())
+
+
+def _vector(weights: Dict[str, float]) -> Tuple[float, ...]:
+    return tuple(float(weights.get(axis, 0.0)) for axis in AXES)
+
+
+def compile_index():
+    exact = {normalize_genre(genre): _vector(weights) for genre, weights in GENRE_TAXONOMY.items()}
+    phrases = {}
+    for table in (GENRE_TAXONOMY, GENRE_TOKEN_RULES):
+        for phrase, weights in table.items():
+            phrases[tuple(normalize_genre(phrase).split())] = weights
+    substrings = sorted(
+        ((normalize_genre(pattern), weights) for pattern, weights in GENRE_SUBSTRING_RULES.items()),
+        key=lambda rule: -len(rule[0]),
+    )
+    max_phrase = max(len(phrase) for phrase in phrases)
+    return exact, phrases, substrings, max_phrase
+
+
+_EXACT, _PHRASES, _SUBSTRINGS, _MAX_PHRASE = compile_index()
+
+
+@lru_cache(maxsize=GENRE_INDEX_CACHE_SIZE)
+def genre_vector(genre: str) -> Tuple[float, ...]:
+    genre = normalize_genre(genre)
+    if genre in _EXACT:
+        return _EXACT[genre]
+    tokens = genre.split()
+    resolved: Dict[str, float] = {}
+    # Longest phrases first; the first rule to set an axis wins
+    for size in range(min(_MAX_PHRASE, len(tokens)), 0, -1):
+        for start in range(len(tokens) - size + 1):
+            weights = _PHRASES.get(tuple(tokens[start:start + size]))
+            if weights:
+                for axis, value in weights.items():
+                    resolved.setdefault(axis, value)
+    for pattern, weights in _SUBSTRINGS:
+        if pattern in genre:
+            for axis, value in weights.items():
+                resolved.setdefault(axis, value)
+    return _vector(resolved) if resolved else ZERO
@@ -0,0 +1,74 @@
+import os
+import re
+import unicodedata
+from typing import Optional
+
+import upstream
+from cache import CACHE_BACKEND, make_cache
+from scheduler import UpstreamUnavailable
+
+# --- LYRICS STORE (SomeRandomAPI) ---
+# Lyrics lookups are cached by normalized (title, artist), including
+# "no lyrics available" answers so known misses never hit the API again
+# until their (shorter) TTL runs out. Transient upstream errors are not cached.
+# Calls turned away by the local scheduler raise UpstreamUnavailable, so
+# callers can tell "throttled" from "no lyrics".
+
+SOMERANDOMAPI_KEY = os.getenv("SOMERANDOMAPI_KEY")
+
+LYRICS_CACHE_BACKEND = os.getenv("LYRICS_CACHE_BACKEND", CACHE_BACKEND)
+LYRICS_HIT_TTL = float(os.getenv("LYRICS_HIT_TTL", str(30 * 24 * 3600)))
+LYRICS_MISS_TTL = float(os.getenv("LYRICS_MISS_TTL", str(24 * 3600)))
+LYRICS_CACHE_MAX_ENTRIES = int(os.getenv("LYRICS_CACHE_MAX_ENTRIES", "5000"))
+
+lyrics_cache = make_cache("lyrics", LYRICS_HIT_TTL, LYRICS_CACHE_MAX_ENTRIES, backend=LYRICS_CACHE_BACKEND)
+
+_whitespace = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text or "").casefold()
+    return _whitespace.sub(" ", text).strip()
+
+
+def lyrics_key(title: str, artist: str) -> str:
+    return f"{normalize(artist)}|{normalize(title)}"
+
+
+def _entry_ttl(entry: dict) -> float:
+    return LYRICS_HIT_TTL if entry.get("lyrics") else LYRICS_MISS_TTL
+
+
+async def _fetch_lyrics(title: str, artist: str) -> Optional[dict]:
+    try:
+        res = await upstream.lyrics_get(title, artist, SOMERANDOMAPI_KEY)
+    except UpstreamUnavailable:
+        raise
+    except Exception:
+        return None
+    if res.status_code == 404:
+        return {"lyrics": None}
+    if res.status_code != 200:
+        return None
+    try:
+        lyrics = res.json().get("lyrics")
+    except Exception:
+        return None
+    if not lyrics or (isinstance(lyrics, str) and not lyrics.strip()):
+        return {"lyrics": None}
+    return {"lyrics": lyrics}
+
+
+async def get_entry(title: str, artist: str) -> Optional[dict]:
+    # {"lyrics": ...} (lyrics None for a known miss), or None if the lookup
+    # failed and nothing is known either way
+    return await lyrics_cache.get_or_set(
+        lyrics_key(title, artist),
+        lambda: _fetch_lyrics(title, artist),
+        ttl=_entry_ttl,
+    )
+
+
+async def get_lyrics(title: str, artist: str) -> Optional[str]:
+    entry = await get_entry(title, artist)
+    return entry["lyrics"] if entry else None
@@ -1,31 +1,106 @@
+import time
+IMPORT_STARTED = time.perf_counter()
+
 from fastapi import FastAPI, Request, HTTPException, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from spotipy import Spotify
-from spotipy.oauth2 import SpotifyOAuth
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Dict, Optional
 from dotenv import load_dotenv
-from mbti_engine import infer_mbti
+from contextlib import asynccontextmanager
 from uuid import uuid4
 
 import os
-import requests
-import httpx
-import certifi
-import sys
-from pymongo import MongoClient
+import json
+import math
+import asyncio
+import logging
 
 load_dotenv()
-app = FastAPI()
 
-SOMERANDOMAPI_KEY = os.getenv("SOMERANDOMAPI_KEY")
-OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s %(message)s",
+)
+logger = logging.getLogger("typetune")
+# httpx logs every request at INFO; upstream calls are covered by /metrics
+if logger.getEffectiveLevel() > logging.DEBUG:
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+from mbti_engine import infer_mbti, infer_mbti_batch, infer_mbti_from_state, new_state, update_state, STATE_VERSION
+import upstream
+import summaries
+import lyrics_store
+import artists
+import result_store
+import stats_store
+import prefetch
+import summary_jobs
+from cache import close_redis
+from mongo import close_async_client
+from metrics import MetricsMiddleware, render_metrics
+from scheduler import UpstreamUnavailable
+import httpx
+import startup
 
-# MongoDB setup
-MONGO_URI = os.getenv("MONGODB_URI")
-mongo_client = MongoClient(MONGO_URI, tls=True, tlsCAFile=certifi.where())
-db = mongo_client["typetune"]
+startup.record("imports", time.perf_counter() - IMPORT_STARTED)
+
+# Heavy optional imports (spotipy, numpy, pymongo) are deferred to first use
+# and pre-loaded by a background warm-up after startup; STARTUP_WARMUP=false
+# skips it.
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "true").lower() in ("1", "true", "yes")
+
+
+async def ensure_result_indexes():
+    try:
+        await result_store.ensure_indexes()
+    except Exception as e:
+        logger.error("[startup] Could not ensure result indexes: %s", e)
+
+def warm_imports():
+    with startup.timed("warmup_spotipy"):
+        get_sp_oauth()
+    with startup.timed("warmup_numpy"):
+        import numpy  # noqa: F401
+    with startup.timed("warmup_pymongo"):
+        import pymongo  # noqa: F401
+
+async def warm_up():
+    started = time.perf_counter()
+    try:
+        if STARTUP_WARMUP:
+            # Imports hold the GIL but not the event loop when run in a thread
+            await asyncio.to_thread(warm_imports)
+        with startup.timed("warmup_mongo_indexes"):
+            await ensure_result_indexes()
+    finally:
+        startup.record("warmup_total", time.perf_counter() - started)
+        startup.log_report()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    with startup.timed("init"):
+        await upstream.open_clients()
+    # Runs in the background so an unreachable Mongo never blocks startup
+    warmup_task = asyncio.create_task(warm_up())
+    prefetch.start()
+    summary_jobs.start()
+    yield
+    warmup_task.cancel()
+    await prefetch.stop()
+    await summary_jobs.stop()
+    await upstream.close_clients()
+    await close_redis()
+    await close_async_client()
+
+# orjson for every JSON response; gzip only pays off for larger bodies (SSE
+# streams are never compressed)
+GZIP_MIN_SIZE = int(os.getenv("GZIP_MIN_SIZE", "1000"))
+
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MIN_SIZE)
+app.add_middleware(MetricsMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -39,23 +114,77 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Spotify Auth Setup
-sp_oauth = SpotifyOAuth(
-    client_id=os.getenv("SPOTIPY_CLIENT_ID"),
-    client_secret=os.getenv("SPOTIPY_CLIENT_SECRET"),
-    redirect_uri=os.getenv("SPOTIPY_REDIRECT_URI"),
-    scope="user-top-read user-read-private",
-    cache_path=None,
-)
+# --- UPSTREAM BACKPRESSURE ---
+# Calls turned away by the local scheduler (rate budget exhausted, circuit
+# open) answer 503 and upstream 429s answer 429, both with a Retry-After
+# header, instead of a generic 500, so clients know to back off and retry.
+DEFAULT_RETRY_AFTER = 1.0
+
+def retry_after_header(seconds: Optional[float]) -> Dict[str, str]:
+    return {"Retry-After": str(max(1, math.ceil(seconds if seconds is not None else DEFAULT_RETRY_AFTER)))}
+
+def upstream_retry_after(response: httpx.Response) -> Optional[float]:
+    try:
+        return float(response.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return None
+
+def rate_limited(response: httpx.Response) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail="Upstream rate limit reached, try again shortly",
+        headers=retry_after_header(upstream_retry_after(response)),
+    )
+
+def backpressure(error: Exception) -> Optional[HTTPException]:
+    # The 429/503 to answer for a throttled upstream call, or None if error
+    # is something else
+    if isinstance(error, UpstreamUnavailable):
+        return HTTPException(
+            status_code=503,
+            detail="Upstream temporarily unavailable, try again shortly",
+            headers=retry_after_header(error.retry_after),
+        )
+    if isinstance(error, httpx.HTTPStatusError) and error.response.status_code == 429:
+        return rate_limited(error.response)
+    return None
+
+def check_rate_limit(response: httpx.Response):
+    if response.status_code == 429:
+        raise rate_limited(response)
+
+@app.exception_handler(UpstreamUnavailable)
+@app.exception_handler(httpx.HTTPStatusError)
+async def upstream_error_handler(request: Request, exc: Exception):
+    error = backpressure(exc)
+    if error is None:
+        logger.error("Upstream error on %s: %s", request.url.path, exc)
+        return ORJSONResponse(status_code=502, content={"detail": "Upstream error"})
+    return ORJSONResponse(status_code=error.status_code, content={"detail": error.detail}, headers=error.headers)
+
+# Spotify Auth Setup (created on first use; importing spotipy is slow)
+_sp_oauth = None
+
+def get_sp_oauth():
+    global _sp_oauth
+    if _sp_oauth is None:
+        from spotipy.oauth2 import SpotifyOAuth
+        _sp_oauth = SpotifyOAuth(
+            client_id=os.getenv("SPOTIPY_CLIENT_ID"),
+            client_secret=os.getenv("SPOTIPY_CLIENT_SECRET"),
+            redirect_uri=os.getenv("SPOTIPY_REDIRECT_URI"),
+            scope="user-top-read user-read-private",
+            cache_path=None,
+        )
+    return _sp_oauth
 
 @app.get("/login")
 def login():
-    url = sp_oauth.get_authorize_url()
+    url = get_sp_oauth().get_authorize_url()
     return {"url": url}
 
 @app.get("/callback")
-def callback(code: str):
-    token_url = "https://accounts.spotify.com/api/token"
+async def callback(code: str):
     data = {
         "grant_type": "authorization_code",
         "code": code,
@@ -63,21 +192,41 @@ def callback(code: str):
         "client_id": os.getenv("SPOTIPY_CLIENT_ID"),
         "client_secret": os.getenv("SPOTIPY_CLIENT_SECRET"),
     }
-    response = requests.post(token_url, data=data)
+    response = await upstream.spotify_exchange_code(data)
+    check_rate_limit(response)
     if response.status_code != 200:
         raise HTTPException(status_code=400, detail="Could not fetch token")
     tokens = response.json()
     return {"access_token": tokens["access_token"]}
 
+# --- FIELD PROJECTION ---
+# ?fields=a,b trims the response to the listed keys (per track for
+# /top-tracks, top-level for /result). Without it the full payload is sent.
+TOP_TRACK_FIELDS = (
+    "track_name", "track_id", "album", "album_image", "release_date", "duration_ms", "popularity",
+    "explicit", "artist_names", "artist_ids", "artist_genres", "artist_popularity",
+)
+
+def parse_fields(fields: Optional[str], allowed) -> Optional[List[str]]:
+    if not fields:
+        return None
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = sorted(set(requested) - set(allowed))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return requested
+
 @app.get("/top-tracks")
-def get_top_tracks(authorization: str = Header(...)):
+async def get_top_tracks(authorization: str = Header(...), fields: Optional[str] = None):
+    selected = parse_fields(fields, TOP_TRACK_FIELDS)
     token = authorization.replace("Bearer ", "")
-    sp = Spotify(auth=token)
     try:
-        top_tracks = sp.current_user_top_tracks(limit=24, time_range="medium_term")
+        top_res = await upstream.spotify_get("/me/top/tracks", token, params={"limit": 24, "time_range": "medium_term"})
+        check_rate_limit(top_res)
+        top_res.raise_for_status()
+        top_tracks = top_res.json()
         artist_ids = [track["artists"][0]["id"] for track in top_tracks["items"] if "artists" in track and track["artists"]]
-        artist_infos = sp.artists(artist_ids)["artists"] if artist_ids else []
-        artist_lookup = {artist["id"]: {"genres": artist.get("genres", []), "popularity": artist.get("popularity", 0)} for artist in artist_infos}
+        artist_lookup = await artists.get_artists(artist_ids, token)
         track_data = []
         for track in top_tracks["items"]:
             artist_id = track["artists"][0]["id"] if track["artists"] else None
@@ -96,8 +245,18 @@ def get_top_tracks(authorization: str = Header(...)):
                 "artist_genres": artist_info.get("genres", []),
                 "artist_popularity": artist_info.get("popularity", 0),
             })
-        return {"tracks": track_data}
+        # Warm lyrics/summaries for the tracks the user is likely to open next
+        prefetch.schedule(track_data)
+        if selected:
+            track_data = [{field: track[field] for field in selected} for track in track_data]
+        # Plain JSON types only, so skip FastAPI's jsonable_encoder pass
+        return ORJSONResponse({"tracks": track_data})
+    except HTTPException:
+        raise
     except Exception as e:
+        error = backpressure(e)
+        if error is not None:
+            raise error
         raise HTTPException(status_code=500, detail=f"Error fetching top tracks: {str(e)}")
 
 class AudioFeaturesPayload(BaseModel):
@@ -109,259 +268,431 @@ def get_mbti(data: AudioFeaturesPayload):
         raise HTTPException(status_code=400, detail="No audio features provided")
     return infer_mbti(data.audio_features)
 
-# --- LYRICS ENDPOINT (SomeRandomAPI only) ---
-@app.get("/lyrics/{track_id}")
-async def get_lyrics(track_id: str, request: Request):
+class MBTIState(BaseModel):
+    version: int = STATE_VERSION
+    track_count: int = 0
+    sums: Dict[str, float]
+    counts: Dict[str, int]
+    genre_counts: Dict[str, int]
+
+class MBTIUpdatePayload(BaseModel):
+    state: Optional[MBTIState] = None
+    added: List[Dict] = []
+    removed: List[Dict] = []
+
+# Incremental scoring: send the stored accumulator state plus only the tracks
+# that changed, get back the new result and the updated state to store.
+@app.post("/mbti/update")
+def update_mbti(data: MBTIUpdatePayload):
+    if data.state is None and not data.added:
+        raise HTTPException(status_code=400, detail="No state or audio features provided")
+    if data.state is not None and data.state.version != STATE_VERSION:
+        raise HTTPException(status_code=400, detail="Unsupported MBTI state version, recompute from full track list")
+    state = data.state.dict() if data.state is not None else new_state()
+    update_state(state, added=data.added, removed=data.removed)
+    if state["track_count"] <= 0:
+        raise HTTPException(status_code=400, detail="No tracks left in MBTI state")
+    result = infer_mbti_from_state(state)
+    result["state"] = state
+    return result
+
+MBTI_BATCH_MAX = int(os.getenv("MBTI_BATCH_MAX", "1000"))
+
+class BatchAudioFeaturesPayload(BaseModel):
+    feature_sets: List[List[Dict]]
+
+@app.post("/mbti/batch")
+def get_mbti_batch(data: BatchAudioFeaturesPayload):
+    if not data.feature_sets:
+        raise HTTPException(status_code=400, detail="No feature sets provided")
+    if len(data.feature_sets) > MBTI_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {MBTI_BATCH_MAX} feature sets per batch")
+    for i, features in enumerate(data.feature_sets):
+        if not features:
+            raise HTTPException(status_code=400, detail=f"No audio features provided for feature set {i}")
+    return {"results": infer_mbti_batch(data.feature_sets)}
+
+# --- SHARED TRACK HELPERS ---
+LYRICS_UNAVAILABLE_MESSAGE = "Lyrics are unavailable for this song. Please try another track or check back later."
+LYRICS_THROTTLED_MESSAGE = "Lyrics are temporarily unavailable due to high demand. Please try again in a moment."
+SUMMARY_UNAVAILABLE_MESSAGE = "Sorry, the AI could not generate a summary at this time."
+
+def bearer_token(request: Request) -> str:
     token = request.headers.get("Authorization")
     if not token:
         raise HTTPException(status_code=401, detail="Missing Spotify access token")
-    token = token.replace("Bearer ", "")
+    return token.replace("Bearer ", "")
 
-    # Get track info (and genres) from Spotify
-    res = requests.get(
-        f"https://api.spotify.com/v1/tracks/{track_id}",
-        headers={"Authorization": f"Bearer {token}"}
-    )
+async def fetch_track(track_id: str, token: str) -> Dict:
+    res = await upstream.spotify_get(f"/tracks/{track_id}", token)
+    check_rate_limit(res)
     if res.status_code != 200:
         raise HTTPException(status_code=res.status_code, detail="Spotify track fetch failed")
-    track = res.json()
-    artist = track["artists"][0]["name"]
-    title = track["name"]
+    return res.json()
 
-    # Try to get genres from artist info
-    sp = Spotify(auth=token)
-    try:
-        artist_data = sp.artist(track["artists"][0]["id"])
-        genres = artist_data.get("genres", [])
-    except Exception:
-        genres = []
-
-    # Try to fetch lyrics
-    api_url = f"https://some-random-api.com/lyrics?title={title}&artist={artist}"
-    headers_lyrics = {"Authorization": SOMERANDOMAPI_KEY}
-    lyrics_res = requests.get(api_url, headers=headers_lyrics)
-    lyrics = None
-    lyrics_available = True
-    lyrics_message = ""
+async def fetch_genres(artist_id: str, token: str) -> List[str]:
     try:
-        lyrics_json = lyrics_res.json()
-        if lyrics_res.status_code == 200 and lyrics_json.get("lyrics"):
-            lyrics = lyrics_json.get("lyrics", "")
-        else:
-            lyrics_available = False
-            lyrics_message = "Lyrics are unavailable for this song. Please try another track or check back later."
+        artist_info = await artists.get_artist(artist_id, token)
+        return artist_info.get("genres", []) if artist_info else []
     except Exception:
-        lyrics_available = False
-        lyrics_message = "Lyrics are unavailable for this song. Please try another track or check back later."
-
-    # --- Bonus fix for empty string/blank lyrics ---
-    if not lyrics or (isinstance(lyrics, str) and not lyrics.strip()):
-        lyrics_available = False
-        if not lyrics_message:
-            lyrics_message = "Lyrics are unavailable for this song. Please try another track or check back later."
-    # -----------------------------------------------
+        return []
 
-    # Generate summary using OpenRouter
+async def lookup_lyrics(title: str, artist: str):
+    # (lyrics, throttled). A throttled lookup is not a miss: callers skip the
+    # song summary instead of paying for one written without lyrics.
     try:
-        summary = await summarize_song_lyrics(title, artist, lyrics, genres)
-    except Exception as e:
-        summary = "Sorry, the AI could not generate a summary at this time."
+        return await lyrics_store.get_lyrics(title, artist), False
+    except UpstreamUnavailable:
+        return None, True
 
+def lyrics_fields(lyrics: Optional[str], throttled: bool = False) -> Dict:
+    if throttled:
+        message = LYRICS_THROTTLED_MESSAGE
+    else:
+        message = "" if lyrics else LYRICS_UNAVAILABLE_MESSAGE
     return {
         "lyrics": lyrics,
-        "lyrics_available": lyrics_available,
-        "lyrics_message": lyrics_message,
-        "summary": summary,
-        "track": {"title": title, "artist": artist, "genres": genres}
+        "lyrics_available": bool(lyrics),
+        "lyrics_message": message,
+        "lyrics_throttled": throttled,
     }
 
+def artist_bio_input(artist_name: str, genres: List[str]) -> str:
+    if genres:
+        return f"Genres: {', '.join(genres)}.\n"
+    return f"Write a 100-word bio for {artist_name}, a musical artist."
 
-
-# --- ARTIST INSIGHT ENDPOINT WITH OPENROUTER ---
-async def summarize_artist_info(artist_name: str, input_text: str) -> str:
-    prompt = (
-        f"Using the following info, write a short ~100-word biography of the musical artist '{artist_name}'. "
-        f"Focus on genre, background, notable achievements, and overall style. Make it sound casual, music-savvy, "
-        f"and human — like something from a fan blog or artist spotlight.\n\n"
-        f"INFO:\n{input_text}"
-    )
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "Content-Type": "application/json",
-        "HTTP-Referer": "https://typetune.vercel.app",
-        "X-Title": "TypeTune"
-    }
-    payload = {
-        "model": "openrouter/horizon-beta",
-        "messages": [
-            {"role": "system", "content": "You are a helpful music expert."},
-            {"role": "user", "content": prompt}
-        ],
-        "temperature": 0.7,
-        "max_tokens": 300
+def artist_fields(spotify_info: Dict) -> Dict:
+    return {
+        "artist_name": spotify_info["name"],
+        "image": spotify_info["image"],
+        "genres": spotify_info["genres"],
+        "popularity": spotify_info["popularity"],
+        "spotify_url": spotify_info["spotify_url"],
     }
-    async with httpx.AsyncClient() as client:
-        resp = await client.post(
-            "https://openrouter.ai/api/v1/chat/completions",
-            headers=headers,
-            json=payload
-        )
-        resp.raise_for_status()
-        return resp.json()["choices"][0]["message"]["content"]
 
-# --- ARTIST INSIGHT ENDPOINT WITH OPENROUTER ---
-async def summarize_artist_info(artist_name: str, input_text: str) -> str:
-    prompt = (
-        f"Using the following info, write a short ~100-word biography of the musical artist '{artist_name}'. "
-        f"Focus on genre, background, notable achievements, and overall style. Make it sound casual, music-savvy, "
-        f"and human — like something from a fan blog or artist spotlight.\n\n"
-        f"INFO:\n{input_text}"
-    )
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "Content-Type": "application/json",
-        "HTTP-Referer": "https://typetune.vercel.app",
-        "X-Title": "TypeTune"
-    }
-    payload = {
-        "model": "openrouter/horizon-beta",
-        "messages": [
-            {"role": "system", "content": "You are a helpful music expert."},
-            {"role": "user", "content": prompt}
-        ],
-        "temperature": 0.7,
-        "max_tokens": 300
+# --- LYRICS ENDPOINT (SomeRandomAPI only) ---
+@app.get("/lyrics/{track_id}")
+async def get_lyrics(track_id: str, request: Request):
+    token = bearer_token(request)
+
+    # Get track info (and genres) from Spotify
+    track = await fetch_track(track_id, token)
+    artist = track["artists"][0]["name"]
+    title = track["name"]
+    genres = await fetch_genres(track["artists"][0]["id"], token)
+
+    # Try to fetch lyrics (cached, including known misses)
+    lyrics, throttled = await lookup_lyrics(title, artist)
+
+    # Generate summary using OpenRouter (skipped if the lyrics were throttled)
+    summary = SUMMARY_UNAVAILABLE_MESSAGE
+    if not throttled:
+        try:
+            summary = await summaries.cached_song_summary(track_id, title, artist, lyrics, genres)
+        except Exception:
+            pass
+
+    return {
+        **lyrics_fields(lyrics, throttled),
+        "summary": summary,
+        "track": {"title": title, "artist": artist, "genres": genres}
     }
-    print("[DEBUG] [summarize_artist_info] Sending request to OpenRouter...", file=sys.stderr)
-    print("[DEBUG] [summarize_artist_info] Prompt:", prompt[:200], file=sys.stderr)
-    print("[DEBUG] [summarize_artist_info] Headers:", headers, file=sys.stderr)
-    print("[DEBUG] [summarize_artist_info] Payload:", payload, file=sys.stderr)
-    async with httpx.AsyncClient() as client:
-        resp = await client.post(
-            "https://openrouter.ai/api/v1/chat/completions",
-            headers=headers,
-            json=payload
-        )
-        print("[DEBUG] [summarize_artist_info] Response status:", resp.status_code, file=sys.stderr)
-        print("[DEBUG] [summarize_artist_info] Response text:", await resp.aread(), file=sys.stderr)
-        resp.raise_for_status()
-        data = resp.json()
-        print("[DEBUG] [summarize_artist_info] Response JSON:", data, file=sys.stderr)
-        return data["choices"][0]["message"]["content"]
 
+
+
+# --- ARTIST INSIGHT ENDPOINT WITH OPENROUTER ---
 @app.get("/artist-insight/{track_id}")
 async def get_artist_insight(track_id: str, request: Request):
-    print(f"[DEBUG] [artist-insight] Track ID received: {track_id}", file=sys.stderr)
+    logger.debug("[artist-insight] Track ID received: %s", track_id)
     token = request.headers.get("Authorization")
     if not token:
-        print("[ERROR] [artist-insight] Missing token", file=sys.stderr)
+        logger.warning("[artist-insight] Missing token")
         raise HTTPException(status_code=401, detail="Missing Spotify access token")
     token = token.replace("Bearer ", "")
-    print(f"[DEBUG] [artist-insight] Token after stripping Bearer: {token[:10]}...", file=sys.stderr)
 
     try:
-        print(f"[DEBUG] [artist-insight] Fetching track from Spotify...", file=sys.stderr)
-        track_resp = requests.get(
-            f"https://api.spotify.com/v1/tracks/{track_id}",
-            headers={"Authorization": f"Bearer {token}"}
-        )
-        print(f"[DEBUG] [artist-insight] Spotify track response status: {track_resp.status_code}", file=sys.stderr)
+        track_resp = await upstream.spotify_get(f"/tracks/{track_id}", token)
+        logger.debug("[artist-insight] Spotify track response status: %s", track_resp.status_code)
+        check_rate_limit(track_resp)
         if track_resp.status_code != 200:
-            print(f"[ERROR] [artist-insight] Spotify track fetch failed: {track_resp.text}", file=sys.stderr)
+            logger.warning("[artist-insight] Spotify track fetch failed: %s", track_resp.status_code)
             raise HTTPException(status_code=track_resp.status_code, detail="Spotify track fetch failed")
         track = track_resp.json()
-        print("[DEBUG] [artist-insight] Track JSON:", track, file=sys.stderr)
         if not track.get("artists") or not track["artists"]:
-            print("[ERROR] [artist-insight] Track has no artists", file=sys.stderr)
+            logger.warning("[artist-insight] Track has no artists: %s", track_id)
             raise HTTPException(status_code=400, detail="Track has no artist data")
         artist_id = track["artists"][0]["id"]
         artist_name = track["artists"][0]["name"]
-        print(f"[DEBUG] [artist-insight] Artist: {artist_name}, ID: {artist_id}", file=sys.stderr)
-
-        sp = Spotify(auth=token)
-        artist_data = sp.artist(artist_id)
-        print(f"[DEBUG] [artist-insight] Spotify artist data: {artist_data}", file=sys.stderr)
-        image_url = None
-        if artist_data.get("images"):
-            image_url = artist_data["images"][0].get("url")
-        spotify_info = {
-            "name": artist_data.get("name"),
-            "genres": artist_data.get("genres", []),
-            "popularity": artist_data.get("popularity"),
-            "image": image_url,
-            "spotify_url": artist_data.get("external_urls", {}).get("spotify")
-        }
-        print(f"[DEBUG] [artist-insight] spotify_info: {spotify_info}", file=sys.stderr)
-        sources_used = []
-        combined_info = ""
-        if spotify_info["genres"]:
-            sources_used.append("spotify")
-            combined_info += f"Genres: {', '.join(spotify_info['genres'])}.\n"
-        if not combined_info.strip():
-            combined_info = f"Write a 100-word bio for {artist_name}, a musical artist."
-        print(f"[DEBUG] [artist-insight] Calling DeepSeek/OpenRouter with info: {combined_info}", file=sys.stderr)
-        summary = await summarize_artist_info(artist_name, combined_info)
-        sources_used.append("deepseek")
-        print(f"[DEBUG] [artist-insight] DeepSeek summary: {summary[:100]}", file=sys.stderr)
+        logger.debug("[artist-insight] Artist: %s, ID: %s", artist_name, artist_id)
+
+        spotify_info = await artists.get_artist(artist_id, token)
+        if spotify_info is None:
+            raise HTTPException(status_code=404, detail="Spotify artist not found")
+        logger.debug("[artist-insight] spotify_info: %s", spotify_info)
+        sources_used = ["spotify"] if spotify_info["genres"] else []
+        combined_info = artist_bio_input(artist_name, spotify_info["genres"])
+        try:
+            summary = await summaries.cached_artist_summary(artist_id, artist_name, combined_info)
+            sources_used.append("deepseek")
+        except UpstreamUnavailable:
+            # OpenRouter circuit open or rate budget exhausted: answer now
+            summary = SUMMARY_UNAVAILABLE_MESSAGE
 
         return {
-            "artist_name": spotify_info["name"],
-            "image": spotify_info["image"],
-            "genres": spotify_info["genres"],
-            "popularity": spotify_info["popularity"],
-            "spotify_url": spotify_info["spotify_url"],
+            **artist_fields(spotify_info),
             "summary": summary,
             "sources_used": sources_used
         }
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"[EXCEPTION] [artist-insight] {e}", file=sys.stderr)
+        error = backpressure(e)
+        if error is not None:
+            raise error
+        logger.exception("[artist-insight] %s", e)
         return JSONResponse(status_code=500, content={"message": f"Artist insight error: {str(e)}"})
 
-async def summarize_song_lyrics(title: str, artist: str, lyrics: Optional[str], genres: Optional[list]) -> str:
-    prompt = (
-        f"Song Title: {title}\n"
-        f"Artist: {artist}\n"
-    )
-    if genres:
-        prompt += f"Genres: {', '.join(genres)}\n"
-    if lyrics:
-        prompt += (
-            f"Lyrics:\n{lyrics}\n\n"
-            f"Based on the lyrics above, give a ~100 word summary of the song's main theme, mood, and possible message or story. "
-            f"If the lyrics are in a foreign language, infer the meaning if possible. "
-            f"Mention any connection to the artist's known style or background if relevant. "
-            f"Write like a music journalist, with clarity and insight, for a general audience."
+# --- COMBINED TRACK INSIGHT ---
+# One call for the Lyrics page: the track is fetched once, then the artist
+# lookup, lyrics lookup, song summary and artist bio run concurrently. Each
+# stage has its own timeout; a failed stage is reported under "errors" and
+# the rest of the response is still returned.
+TRACK_INSIGHT_TIMEOUTS = {
+    "artist": float(os.getenv("TRACK_INSIGHT_ARTIST_TIMEOUT", "5")),
+    "lyrics": float(os.getenv("TRACK_INSIGHT_LYRICS_TIMEOUT", "5")),
+    "song_summary": float(os.getenv("TRACK_INSIGHT_SUMMARY_TIMEOUT", "25")),
+    "artist_summary": float(os.getenv("TRACK_INSIGHT_SUMMARY_TIMEOUT", "25")),
+}
+
+async def run_stage(name: str, coro, errors: Dict):
+    try:
+        return await asyncio.wait_for(coro, TRACK_INSIGHT_TIMEOUTS[name])
+    except asyncio.TimeoutError:
+        errors[name] = "timed out"
+    except Exception as e:
+        errors[name] = str(e) or e.__class__.__name__
+    return None
+
+@app.get("/track-insight/{track_id}")
+async def get_track_insight(track_id: str, request: Request):
+    token = bearer_token(request)
+    track = await fetch_track(track_id, token)
+    if not track.get("artists"):
+        raise HTTPException(status_code=400, detail="Track has no artist data")
+    artist_id = track["artists"][0]["id"]
+    artist_name = track["artists"][0]["name"]
+    title = track["name"]
+    errors = {}
+
+    artist_stage = asyncio.ensure_future(run_stage("artist", artists.get_artist(artist_id, token), errors))
+    lyrics_stage = asyncio.ensure_future(run_stage("lyrics", lookup_lyrics(title, artist_name), errors))
+
+    async def song_summary():
+        spotify_info, lyrics_result = await asyncio.gather(artist_stage, lyrics_stage)
+        lyrics, throttled = lyrics_result or (None, False)
+        if throttled:
+            errors["lyrics"] = "throttled"
+            errors["song_summary"] = "skipped, lyrics lookup throttled"
+            return None
+        genres = spotify_info["genres"] if spotify_info else []
+        return await run_stage(
+            "song_summary",
+            summaries.cached_song_summary(track_id, title, artist_name, lyrics, genres),
+            errors,
         )
-    else:
-        prompt += (
-            "No lyrics were found for this song. Based on the title, artist, and genre(s), "
-            "write a ~100 word summary of what the song could be about or the kind of mood and themes it might have. "
-            "If the artist is known for particular styles or stories, include that context."
+
+    async def artist_summary():
+        spotify_info = await artist_stage
+        genres = spotify_info["genres"] if spotify_info else []
+        return await run_stage(
+            "artist_summary",
+            summaries.cached_artist_summary(artist_id, artist_name, artist_bio_input(artist_name, genres)),
+            errors,
         )
 
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "Content-Type": "application/json",
-        "HTTP-Referer": "https://typetune.vercel.app",
-        "X-Title": "TypeTune"
+    song_summary_text, artist_summary_text = await asyncio.gather(song_summary(), artist_summary())
+    spotify_info = artist_stage.result()
+    genres = spotify_info["genres"] if spotify_info else []
+
+    return {
+        **lyrics_fields(*(lyrics_stage.result() or (None, False))),
+        "summary": song_summary_text or SUMMARY_UNAVAILABLE_MESSAGE,
+        "track": {"title": title, "artist": artist_name, "genres": genres},
+        "artist": {
+            **(artist_fields(spotify_info) if spotify_info else {"artist_name": artist_name}),
+            "summary": artist_summary_text or SUMMARY_UNAVAILABLE_MESSAGE,
+        },
+        "errors": errors,
     }
-    payload = {
-        "model": "openrouter/horizon-beta",
-        "messages": [
-            {"role": "system", "content": "You are a helpful and insightful music journalist."},
-            {"role": "user", "content": prompt}
-        ],
-        "temperature": 0.7,
-        "max_tokens": 300
+
+# --- STREAMING (SSE) VARIANTS ---
+# Same data as /lyrics and /artist-insight, but each piece is sent as a
+# Server-Sent Event as soon as it is ready and the LLM summary streams in
+# token by token. Every stream ends with a single "summary" event.
+def sse_event(event: str, data: Dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def sse_response(events) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+async def stream_with_fallback(summary_events):
+    try:
+        async for event, data in summary_events:
+            yield sse_event(event, data)
+    except Exception:
+        yield sse_event("summary", {"summary": SUMMARY_UNAVAILABLE_MESSAGE, "cached": False, "error": True})
+
+@app.get("/lyrics/{track_id}/stream")
+async def stream_lyrics(track_id: str, request: Request):
+    token = bearer_token(request)
+    track = await fetch_track(track_id, token)
+    artist = track["artists"][0]["name"]
+    title = track["name"]
+
+    async def events():
+        lyrics_task = asyncio.ensure_future(lookup_lyrics(title, artist))
+        try:
+            genres = await fetch_genres(track["artists"][0]["id"], token)
+            yield sse_event("track", {"title": title, "artist": artist, "genres": genres})
+            lyrics, throttled = await lyrics_task
+            yield sse_event("lyrics", lyrics_fields(lyrics, throttled))
+        finally:
+            lyrics_task.cancel()
+        if throttled:
+            yield sse_event("summary", {"summary": SUMMARY_UNAVAILABLE_MESSAGE, "cached": False, "error": True})
+            return
+        summary_events = summaries.stream_song_summary(track_id, title, artist, lyrics, genres)
+        async for chunk in stream_with_fallback(summary_events):
+            yield chunk
+
+    return sse_response(events())
+
+@app.get("/artist-insight/{track_id}/stream")
+async def stream_artist_insight(track_id: str, request: Request):
+    token = bearer_token(request)
+    track = await fetch_track(track_id, token)
+    if not track.get("artists"):
+        raise HTTPException(status_code=400, detail="Track has no artist data")
+    artist_id = track["artists"][0]["id"]
+    artist_name = track["artists"][0]["name"]
+
+    async def events():
+        try:
+            spotify_info = await artists.get_artist(artist_id, token)
+        except Exception as e:
+            # The 200 is already sent: report throttling as an event instead
+            error = backpressure(e)
+            if error is None:
+                raise
+            yield sse_event("error", {"message": error.detail, "retry_after": int(error.headers["Retry-After"])})
+            return
+        if spotify_info is None:
+            yield sse_event("error", {"message": "Spotify artist not found"})
+            return
+        yield sse_event("artist", artist_fields(spotify_info))
+        combined_info = artist_bio_input(artist_name, spotify_info["genres"])
+        summary_events = summaries.stream_artist_summary(artist_id, artist_name, combined_info)
+        async for chunk in stream_with_fallback(summary_events):
+            yield chunk
+
+    return sse_response(events())
+
+# --- SUMMARY JOBS ---
+# Non-blocking variants of /lyrics and /artist-insight: the Spotify and lyrics
+# data is returned right away with a summary job, whose result is fetched by
+# polling GET /summary-jobs/{job_id} or from its SSE stream.
+SUMMARY_JOB_POLL_INTERVAL = float(os.getenv("SUMMARY_JOB_POLL_INTERVAL", "0.5"))
+# A job stream gives up (and sends the fallback summary) after this long
+SUMMARY_JOB_STREAM_TIMEOUT = float(os.getenv(
+    "SUMMARY_JOB_STREAM_TIMEOUT",
+    str(summary_jobs.SUMMARY_JOB_MAX_QUEUE_WAIT + summary_jobs.SUMMARY_JOB_TIMEOUT),
+))
+
+async def submit_summary_job(kind: str, params: Dict) -> Dict:
+    try:
+        return await summary_jobs.submit(kind, params)
+    except summary_jobs.JobQueueFull:
+        raise HTTPException(status_code=503, detail="Summary queue is full, try again shortly")
+
+@app.post("/lyrics/{track_id}/summary-job", status_code=202)
+async def create_song_summary_job(track_id: str, request: Request):
+    token = bearer_token(request)
+    track = await fetch_track(track_id, token)
+    artist = track["artists"][0]["name"]
+    title = track["name"]
+    genres, (lyrics, throttled) = await asyncio.gather(
+        fetch_genres(track["artists"][0]["id"], token),
+        lookup_lyrics(title, artist),
+    )
+    # No job for a throttled lookup: a summary without lyrics would be wasted
+    job = None
+    if not throttled:
+        job = await submit_summary_job(summary_jobs.SONG, {
+            "track_id": track_id, "title": title, "artist": artist, "lyrics": lyrics, "genres": genres,
+        })
+    return {
+        **lyrics_fields(lyrics, throttled),
+        "track": {"title": title, "artist": artist, "genres": genres},
+        "job": job,
     }
-    async with httpx.AsyncClient() as client:
-        resp = await client.post(
-            "https://openrouter.ai/api/v1/chat/completions",
-            headers=headers,
-            json=payload
-        )
-        resp.raise_for_status()
-        return resp.json()["choices"][0]["message"]["content"]
+
+@app.post("/artist-insight/{track_id}/summary-job", status_code=202)
+async def create_artist_summary_job(track_id: str, request: Request):
+    token = bearer_token(request)
+    track = await fetch_track(track_id, token)
+    if not track.get("artists"):
+        raise HTTPException(status_code=400, detail="Track has no artist data")
+    artist_id = track["artists"][0]["id"]
+    artist_name = track["artists"][0]["name"]
+    spotify_info = await artists.get_artist(artist_id, token)
+    if spotify_info is None:
+        raise HTTPException(status_code=404, detail="Spotify artist not found")
+    job = await submit_summary_job(summary_jobs.ARTIST, {
+        "artist_id": artist_id,
+        "artist_name": artist_name,
+        "input_text": artist_bio_input(artist_name, spotify_info["genres"]),
+    })
+    return {**artist_fields(spotify_info), "job": job}
+
+@app.get("/summary-jobs/{job_id}")
+async def get_summary_job(job_id: str):
+    job = await summary_jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Summary job not found")
+    return job
+
+@app.get("/summary-jobs/{job_id}/stream")
+async def stream_summary_job(job_id: str):
+    job = await summary_jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Summary job not found")
+
+    async def events():
+        current = job
+        status = None
+        deadline = time.monotonic() + SUMMARY_JOB_STREAM_TIMEOUT
+        while True:
+            if current is None:
+                yield sse_event("error", {"message": "Summary job expired"})
+                return
+            if current["status"] != status:
+                status = current["status"]
+                yield sse_event("status", {"job_id": job_id, "status": status})
+            if status in (summary_jobs.DONE, summary_jobs.FAILED) or time.monotonic() >= deadline:
+                break
+            await asyncio.sleep(SUMMARY_JOB_POLL_INTERVAL)
+            current = await summary_jobs.get_job(job_id)
+        if status == summary_jobs.DONE:
+            yield sse_event("summary", {"summary": current["summary"], "cached": False})
+        else:
+            yield sse_event("summary", {"summary": SUMMARY_UNAVAILABLE_MESSAGE, "cached": False, "error": True})
+
+    return sse_response(events())
 
 # --- RESULT SHARING AND PING ---
 class SharedResult(BaseModel):
@@ -371,22 +702,36 @@ class SharedResult(BaseModel):
     tracks_used: List[Dict]
     user: Optional[str] = None
     spotify_id: Optional[str] = None
+    mbti_state: Optional[Dict] = None
 
 @app.post("/save-result")
-def save_result(result: SharedResult):
-    result_id = str(uuid4())
+async def save_result(result: SharedResult):
     record = result.dict()
-    record["result_id"] = result_id
-    db.results.insert_one(record)
+    record["result_id"] = str(uuid4())
+    result_id = await result_store.save_result(record)
     return {"result_id": result_id}
 
 @app.get("/result/{result_id}")
-def get_result(result_id: str):
-    result = db.results.find_one({"result_id": result_id})
-    if not result:
+async def get_result(result_id: str, fields: Optional[str] = None):
+    selected = parse_fields(fields, result_store.RESULT_FIELDS)
+    result = await result_store.get_result(result_id, selected)
+    if result is None:
         raise HTTPException(status_code=404, detail="Result not found")
-    result.pop("_id", None)
-    return result
+    return ORJSONResponse(result)
+
+@app.get("/stats")
+async def get_stats():
+    # Per-type counts, shares, average breakdown values and top genres over
+    # every saved result, from a snapshot refreshed every STATS_CACHE_TTL s
+    return ORJSONResponse(await stats_store.get_stats())
+
+@app.get("/metrics")
+def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/startup")
+def startup_report():
+    return startup.report()
 
 @app.api_route("/ping", methods=["GET", "HEAD"])
 async def ping():
@@ -1,55 +1,188 @@
 from collections import Counter
+from itertools import chain
+
+from genre_index import genre_vector
+
+
+# --- Scoring Constants ---
+# Genre weights live in genre_index.py
+AVG_KEYS = ("popularity", "duration_ms", "artist_popularity")
+EXPECTED_AVERAGE_DURATION = 215000
+TOP_GENRE_COUNT = 3
+
+
+# --- Accumulator State ---
+# Compact, JSON-serializable running totals (sums/counts for the averaged keys
+# plus genre counts). Tracks can be added or removed in O(delta) and the
+# MBTI result is derived from the state alone, so a returning user's type can
+# be refreshed from only their changed tracks.
+STATE_VERSION = 1
+
+
+def new_state():
+    return {
+        "version": STATE_VERSION,
+        "track_count": 0,
+        "sums": {key: 0 for key in AVG_KEYS},
+        "counts": {key: 0 for key in AVG_KEYS},
+        "genre_counts": {},
+    }
+
+
+def _apply_track(state, f, sign):
+    sums, counts, genre_counts = state["sums"], state["counts"], state["genre_counts"]
+    for key in AVG_KEYS:
+        value = f.get(key)
+        if value is not None:
+            sums[key] = sums.get(key, 0) + sign * value
+            counts[key] = counts.get(key, 0) + sign
+    for genre in f.get("artist_genres") or []:
+        count = genre_counts.get(genre, 0) + sign
+        if count > 0:
+            genre_counts[genre] = count
+        else:
+            genre_counts.pop(genre, None)
+    state["track_count"] = state.get("track_count", 0) + sign
+
+
+def update_state(state, added=(), removed=()):
+    for f in added:
+        _apply_track(state, f, 1)
+    for f in removed:
+        _apply_track(state, f, -1)
+    return state
+
+
+def summarize_state(state):
+    sums, counts = state["sums"], state["counts"]
+    averages = [sums.get(key, 0) / counts[key] if counts.get(key, 0) > 0 else 0 for key in AVG_KEYS]
+    # most_common() keeps first-seen order for ties, same as counting the
+    # track list directly (ties may differ once tracks have been removed).
+    genre_tags = [g for g, _ in Counter(state["genre_counts"]).most_common(TOP_GENRE_COUNT)]
+    return averages, genre_tags
+
+
+def aggregate_features(features):
+    # Single pass over the tracks instead of one scan per averaged key.
+    return summarize_state(update_state(new_state(), added=features))
+
+
+def _strongest(values):
+    # A single nudge per axis: the largest boost, else the largest penalty
+    values = list(values)
+    positive = [v for v in values if v > 0]
+    if positive:
+        return max(positive)
+    negative = [v for v in values if v < 0]
+    return min(negative) if negative else 0.0
+
+
+def genre_adjustments(genre_tags):
+    # Genre nudges for each axis. J/P is a per-tag list (in tag order) so the
+    # scalar and vectorized paths add the same floats in the same order.
+    vectors = [genre_vector(g) for g in genre_tags]
+    ei_boost = _strongest(v[0] for v in vectors)
+    sn_boost = _strongest(v[1] for v in vectors)
+    tf_shift = _strongest(v[2] for v in vectors)
+    jp_deltas = [v[3] for v in vectors]
+    return ei_boost, sn_boost, tf_shift, jp_deltas
+
+
+def clamp(value):
+    return min(max(value, 0), 1)
+
 
 def infer_mbti(features):
-    def avg(key):
-        values = [f[key] for f in features if f.get(key) is not None]
-        print(f"Averaging {key}: {values}")
-        return sum(values) / len(values) if values else 0
+    return infer_mbti_from_state(update_state(new_state(), added=features))
 
-    def top_genres():
-        genre_list = [genre for f in features for genre in f.get("artist_genres", [])]
-        genre_counts = Counter(genre_list)
-        print("Top genres:", genre_counts.most_common(3))
-        return genre_counts.most_common(3)
 
+def infer_mbti_from_state(state):
     # --- Compute Averages ---
-    track_popularity = avg("popularity")
-    duration_ms = avg("duration_ms")
-    artist_popularity = avg("artist_popularity")
-    common_genres = top_genres()
-    genre_tags = [g[0] for g in common_genres]
+    (track_popularity, duration_ms, artist_popularity), genre_tags = summarize_state(state)
+    ei_boost, sn_boost, tf_shift, jp_deltas = genre_adjustments(genre_tags)
 
     # --- Scoring & Logic ---
-    ei_score = track_popularity / 100
-    if any(g in genre_tags for g in ['dance pop', 'pop rap', 'edm']):
-        ei_score += 0.03
-    ei_score = min(max(ei_score, 0), 1)
-
-    expected_average = 215000
-    sn_score = (expected_average - duration_ms) / 120000 + 0.5
-    if 'acoustic' in genre_tags:
-        sn_score += 0.02
-    sn_score = min(max(sn_score, 0), 1)
-    sn = 'S' if sn_score >= 0.5 else 'N'
+    ei_score = clamp(track_popularity / 100 + ei_boost)
+    sn_score = clamp((EXPECTED_AVERAGE_DURATION - duration_ms) / 120000 + 0.5 + sn_boost)
+    tf_score = clamp(artist_popularity / 100 + tf_shift)
+    jp_score = 0.5
+    for delta in jp_deltas:
+        jp_score += delta
+    jp_score = clamp(jp_score)
 
-    tf_score = artist_popularity / 100
-    if any(g in genre_tags for g in ['rap', 'trap', 'metal']):
-        tf_score += 0.04
-    elif any(g in genre_tags for g in ['r&b', 'soul', 'neo mellow', 'ballad', 'k-ballad']):
-        tf_score -= 0.04
-    tf_score = min(max(tf_score, 0), 1)
+    return build_result(track_popularity, duration_ms, artist_popularity, genre_tags,
+                        ei_score, sn_score, tf_score, jp_score)
 
-    j_genres = {'classical', 'k-pop', 'j-pop', 'indie pop', 'broadway', 'neo mellow', 'dance pop', 'pop'}
-    p_genres = {'lo-fi', 'alt z', 'trap', 'vaporwave', 'indie rock', 'psychedelic rock'}
 
-    jp_score = 0.5
-    for g in genre_tags:
-        if g in j_genres:
-            jp_score += 0.05
-        elif g in p_genres:
-            jp_score -= 0.05
-    jp_score = min(max(jp_score, 0), 1)
+def infer_mbti_batch(feature_sets):
+    # Score many users at once: every track of every set is flattened into
+    # arrays tagged with its set index, sums/counts come from bincount and
+    # the top genres from one sort over (set, genre) pairs, so the Python
+    # work per track is only pulling values out of the dicts. Results match
+    # infer_mbti exactly (same float additions in the same order).
+    if not feature_sets:
+        return []
+    import numpy as np  # only batch scoring needs it; keeps cold start fast
+    n_sets = len(feature_sets)
+    tracks = [f for features in feature_sets for f in features]
+    track_set = np.repeat(np.arange(n_sets), [len(features) for features in feature_sets])
+
+    # --- Averages ---
+    averages = np.zeros((n_sets, len(AVG_KEYS)))
+    for column, key in enumerate(AVG_KEYS):
+        values = np.array([f.get(key) for f in tracks], dtype=np.float64)  # None -> nan
+        present = ~np.isnan(values)
+        sums = np.bincount(track_set[present], weights=values[present], minlength=n_sets)
+        counts = np.bincount(track_set[present], minlength=n_sets)
+        np.divide(sums, counts, out=averages[:, column], where=counts > 0)
+
+    # --- Top genres ---
+    genre_lists = [f.get("artist_genres") or () for f in tracks]
+    flat_genres = list(chain.from_iterable(genre_lists))
+    genres = list(dict.fromkeys(flat_genres))
+    codes = {genre: code for code, genre in enumerate(genres)}
+    tag_codes = np.full((n_sets, TOP_GENRE_COUNT), -1)
+    if flat_genres:
+        genre_set = np.repeat(track_set, list(map(len, genre_lists)))
+        pairs = genre_set * len(genres) + np.fromiter(map(codes.__getitem__, flat_genres), dtype=np.int64, count=len(flat_genres))
+        # Per (set, genre): occurrence count and first position. Sorting by
+        # set, then count descending, then first position reproduces
+        # Counter.most_common's tie order (first seen wins).
+        unique_pairs, first_seen, pair_counts = np.unique(pairs, return_index=True, return_counts=True)
+        pair_sets, pair_genres = np.divmod(unique_pairs, len(genres))
+        order = np.lexsort((first_seen, -pair_counts, pair_sets))
+        pair_sets, pair_genres = pair_sets[order], pair_genres[order]
+        rank = np.arange(len(order)) - np.searchsorted(pair_sets, pair_sets)
+        top = rank < TOP_GENRE_COUNT
+        tag_codes[pair_sets[top], rank[top]] = pair_genres[top]
+
+    # --- Genre adjustments ---
+    vectors = np.array([genre_vector(g) for g in genres] + [(0.0, 0.0, 0.0, 0.0)])
+    tag_vectors = vectors[tag_codes]  # -1 (no tag) picks the zero row
+    positive = np.where(tag_vectors[:, :, :3] > 0, tag_vectors[:, :, :3], 0).max(axis=1)
+    negative = np.where(tag_vectors[:, :, :3] < 0, tag_vectors[:, :, :3], 0).min(axis=1)
+    ei_boost, sn_boost, tf_shift = np.where(positive > 0, positive, negative).T
+
+    # --- Scoring ---
+    ei_scores = np.clip(averages[:, 0] / 100 + ei_boost, 0, 1)
+    sn_scores = np.clip((EXPECTED_AVERAGE_DURATION - averages[:, 1]) / 120000 + 0.5 + sn_boost, 0, 1)
+    tf_scores = np.clip(averages[:, 2] / 100 + tf_shift, 0, 1)
+    jp_scores = np.full(n_sets, 0.5)
+    for column in range(TOP_GENRE_COUNT):
+        jp_scores += tag_vectors[:, column, 3]
+    jp_scores = np.clip(jp_scores, 0, 1)
+
+    tag_lists = [[genres[code] for code in row if code >= 0] for row in tag_codes.tolist()]
+    return [
+        build_result(*averages[row].tolist(), tag_lists[row],
+                     ei_scores[row].item(), sn_scores[row].item(),
+                     tf_scores[row].item(), jp_scores[row].item())
+        for row in range(n_sets)
+    ]
+
 
+def build_result(track_popularity, duration_ms, artist_popularity, genre_tags,
+                 ei_score, sn_score, tf_score, jp_score):
     ei = 'E' if ei_score >= 0.5 else 'I'
     sn = 'S' if sn_score >= 0.5 else 'N'
     tf = 'T' if tf_score >= 0.5 else 'F'
@@ -0,0 +1,56 @@
+import os
+
+import certifi
+
+from metrics import UPSTREAM_LATENCY
+
+# --- ASYNC MONGODB CLIENT ---
+# Shared AsyncMongoClient (pymongo's native asyncio API), created on first use
+# so importing a module that needs Mongo never opens a connection by itself.
+
+MONGO_URI = os.getenv("MONGODB_URI")
+MONGO_DB_NAME = os.getenv("MONGODB_DB", "typetune")
+# Atlas needs TLS; set MONGODB_TLS=false for a local mongod (e.g. benchmarks)
+MONGO_TLS = os.getenv("MONGODB_TLS", "true").lower() in ("1", "true", "yes")
+
+_async_client = None
+
+
+def command_metrics_listener():
+    # Records every Mongo command (find, insert, update, ...) in the upstream
+    # latency histogram without wrapping each call site. Defined lazily so
+    # importing this module does not pull in pymongo.
+    from pymongo import monitoring
+
+    class CommandMetrics(monitoring.CommandListener):
+        def started(self, event):
+            pass
+
+        def succeeded(self, event):
+            UPSTREAM_LATENCY.observe(event.duration_micros / 1e6, upstream="mongo", operation=event.command_name, outcome="ok")
+
+        def failed(self, event):
+            UPSTREAM_LATENCY.observe(event.duration_micros / 1e6, upstream="mongo", operation=event.command_name, outcome="error")
+
+    return CommandMetrics()
+
+
+def get_async_db():
+    global _async_client
+    if _async_client is None:
+        from pymongo import AsyncMongoClient
+        tls_options = {"tls": True, "tlsCAFile": certifi.where()} if MONGO_TLS else {}
+        _async_client = AsyncMongoClient(
+            MONGO_URI,
+            event_listeners=[command_metrics_listener()],
+            **tls_options,
+        )
+    return _async_client[MONGO_DB_NAME]
+
+
+async def close_async_client():
+    global _async_client
+    if _async_client is not None:
+        await _async_client.close()
+        _async_client = None
+
@@ -0,0 +1,135 @@
+import os
+import asyncio
+import itertools
+import logging
+from typing import Dict, List, Optional, Set
+
+import lyrics_store
+import summaries
+import upstream
+from metrics import Counter
+from scheduler import UpstreamUnavailable, get_policy
+
+# --- BACKGROUND PREFETCH ---
+# After /top-tracks answers, warm the lyrics and song-summary caches for the
+# user's first few tracks so opening the Lyrics page is usually a cache hit.
+# Jobs go through a bounded priority queue (higher-ranked tracks first) served
+# by a fixed worker pool, which is the global concurrency cap. Tracks already
+# queued or already cached are skipped. Prefetch shares the upstream rate
+# limits with user requests, so it only calls an upstream while that bucket
+# holds more than PREFETCH_RESERVE of its burst, and never writes a lyric-less
+# summary for a lookup that failed rather than missed. Off unless
+# PREFETCH_ENABLED=true.
+
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "false").lower() in ("1", "true", "yes")
+PREFETCH_TRACKS = int(os.getenv("PREFETCH_TRACKS", "5"))
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "2"))
+PREFETCH_QUEUE_SIZE = int(os.getenv("PREFETCH_QUEUE_SIZE", "200"))
+PREFETCH_SUMMARIES = os.getenv("PREFETCH_SUMMARIES", "true").lower() in ("1", "true", "yes")
+# Fraction of each upstream's burst kept free for interactive requests
+PREFETCH_RESERVE = float(os.getenv("PREFETCH_RESERVE", "0.5"))
+
+PREFETCH_JOBS = Counter(
+    "typetune_prefetch_jobs_total",
+    "Prefetch jobs by outcome (queued, duplicate, dropped, cached, warmed, skipped, error).",
+    ("outcome",),
+)
+
+logger = logging.getLogger("typetune.prefetch")
+
+_queue: Optional[asyncio.PriorityQueue] = None
+_workers: List[asyncio.Task] = []
+_pending: Set[str] = set()
+_sequence = itertools.count()
+
+
+def schedule(tracks: List[Dict]):
+    # Called with the /top-tracks payload; never blocks the response.
+    if _queue is None:
+        return
+    for rank, track in enumerate(tracks[:PREFETCH_TRACKS]):
+        track_id = track.get("track_id")
+        if not track_id or not track.get("artist_names"):
+            continue
+        if track_id in _pending:
+            PREFETCH_JOBS.inc(outcome="duplicate")
+            continue
+        job = {
+            "track_id": track_id,
+            "title": track["track_name"],
+            "artist": track["artist_names"][0],
+            "genres": track.get("artist_genres", []),
+        }
+        try:
+            # Rank first so every user's top track beats anyone's fifth;
+            # the sequence number keeps equal ranks in arrival order.
+            _queue.put_nowait((rank, next(_sequence), job))
+        except asyncio.QueueFull:
+            PREFETCH_JOBS.inc(outcome="dropped")
+            continue
+        _pending.add(track_id)
+        PREFETCH_JOBS.inc(outcome="queued")
+
+
+def _has_spare(name: str) -> bool:
+    return get_policy(name).has_spare(PREFETCH_RESERVE)
+
+
+async def _warm(job: Dict) -> str:
+    # Returns the outcome: "cached" when everything was already cached,
+    # "skipped" when an upstream had no spare capacity or the lookup failed.
+    title, artist = job["title"], job["artist"]
+    entry = await lyrics_store.lyrics_cache.peek(lyrics_store.lyrics_key(title, artist))
+    warmed = entry is None
+    if warmed:
+        if not _has_spare(upstream.LYRICS):
+            return "skipped"
+        entry = await lyrics_store.get_entry(title, artist)
+        if entry is None:
+            # Failed lookup, not a known miss: a summary now would be lyric-less
+            return "skipped"
+    lyrics = entry["lyrics"]
+    if PREFETCH_SUMMARIES:
+        key = summaries.song_cache_key(job["track_id"], bool(lyrics))
+        if await summaries.summary_cache.peek(key) is None:
+            if not _has_spare(upstream.OPENROUTER):
+                return "warmed" if warmed else "skipped"
+            await summaries.cached_song_summary(job["track_id"], title, artist, lyrics, job["genres"])
+            warmed = True
+    return "warmed" if warmed else "cached"
+
+
+async def _worker():
+    while True:
+        _, _, job = await _queue.get()
+        try:
+            PREFETCH_JOBS.inc(outcome=await _warm(job))
+        except asyncio.CancelledError:
+            raise
+        except UpstreamUnavailable:
+            # Throttled or circuit open between the check and the call
+            PREFETCH_JOBS.inc(outcome="skipped")
+        except Exception as e:
+            PREFETCH_JOBS.inc(outcome="error")
+            logger.debug("Prefetch failed for %s: %s", job["track_id"], e)
+        finally:
+            _pending.discard(job["track_id"])
+            _queue.task_done()
+
+
+def start():
+    global _queue
+    if not PREFETCH_ENABLED or _queue is not None:
+        return
+    _queue = asyncio.PriorityQueue(maxsize=PREFETCH_QUEUE_SIZE)
+    _workers.extend(asyncio.create_task(_worker()) for _ in range(PREFETCH_WORKERS))
+
+
+async def stop():
+    global _queue
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+    _pending.clear()
+    _queue = None
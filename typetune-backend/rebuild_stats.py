@@ -0,0 +1,29 @@
+import asyncio
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import stats_store
+from mongo import close_async_client
+
+# --- OFFLINE STATS REBUILD ---
+# Recomputes db.result_stats from every stored result, e.g. after a backfill
+# or if the incremental counters drifted:
+#
+#   cd typetune-backend
+#   python rebuild_stats.py
+
+
+async def main():
+    try:
+        counts = await stats_store.rebuild()
+    finally:
+        await close_async_client()
+    print(f"Rebuilt stats for {sum(counts.values())} results across {len(counts)} types")
+    for mbti, count in sorted(counts.items(), key=lambda item: -item[1]):
+        print(f"  {mbti}: {count}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
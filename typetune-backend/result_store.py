@@ -0,0 +1,194 @@
+import os
+import json
+import hashlib
+import logging
+from typing import Dict, List, Optional
+
+import stats_store
+from cache import make_cache
+from mongo import get_async_db
+
+# --- SHARED RESULT STORE (MongoDB) ---
+# Async access to db.results with a unique index on result_id and a small
+# read-through cache, since shared links tend to be opened in bursts.
+# pymongo is imported inside the functions that need it to keep cold start fast.
+
+RESULTS_WRITE_CONCERN_W = os.getenv("RESULTS_WRITE_CONCERN_W", "majority")
+RESULTS_WRITE_CONCERN_J = os.getenv("RESULTS_WRITE_CONCERN_J", "false").lower() in ("1", "true", "yes")
+# "compact" stores results content-addressed with shared track/artist details;
+# "full" stores the whole tracks_used list in every result document.
+RESULT_STORAGE_MODE = os.getenv("RESULT_STORAGE_MODE", "compact").lower()
+RESULT_CACHE_BACKEND = os.getenv("RESULT_CACHE_BACKEND", "memory")
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "300"))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "2000"))
+
+logger = logging.getLogger("typetune.results")
+
+result_cache = make_cache("result", RESULT_CACHE_TTL, RESULT_CACHE_MAX_ENTRIES, backend=RESULT_CACHE_BACKEND)
+
+
+def _write_concern():
+    from pymongo import WriteConcern
+    w = RESULTS_WRITE_CONCERN_W
+    return WriteConcern(w=int(w) if w.isdigit() else w, j=RESULTS_WRITE_CONCERN_J or None)
+
+
+def results_collection():
+    return get_async_db().get_collection("results", write_concern=_write_concern())
+
+
+def tracks_collection():
+    return get_async_db().get_collection("result_tracks", write_concern=_write_concern())
+
+
+def artists_collection():
+    return get_async_db().get_collection("result_artists", write_concern=_write_concern())
+
+
+async def ensure_indexes():
+    await results_collection().create_index("result_id", unique=True)
+    await results_collection().create_index(
+        "content_hash",
+        unique=True,
+        partialFilterExpression={"content_hash": {"$exists": True}},
+    )
+
+
+# --- CONTENT-ADDRESSED STORAGE ---
+# A result is identified by a canonical hash of what it shows (type,
+# breakdown, track ids and who saved it), so re-saving the same result
+# returns the existing result_id. Track details and the per-artist fields
+# copied onto each track are stored once, keyed by the hash of their content,
+# and stitched back together on read so /result returns the same document.
+ARTIST_DETAIL_KEYS = ("artist_genres", "artist_popularity")
+
+
+def content_hash(value) -> str:
+    canonical = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def result_hash(record: Dict) -> str:
+    return content_hash({
+        "mbti": record.get("mbti"),
+        "breakdown": record.get("breakdown"),
+        "track_ids": [track.get("track_id") for track in record.get("tracks_used", [])],
+        "user": record.get("user"),
+        "spotify_id": record.get("spotify_id"),
+    })
+
+
+def split_track(track: Dict):
+    artist = {key: track[key] for key in ARTIST_DETAIL_KEYS if key in track}
+    details = {key: value for key, value in track.items() if key not in ARTIST_DETAIL_KEYS}
+    artist_ref = content_hash(artist) if artist else None
+    details["artist_ref"] = artist_ref
+    return content_hash(details), details, artist_ref, artist
+
+
+async def _save_compact(record: Dict) -> str:
+    from pymongo import UpdateOne
+    from pymongo.errors import DuplicateKeyError
+    record_hash = result_hash(record)
+    existing = await results_collection().find_one({"content_hash": record_hash}, {"result_id": 1})
+    if existing:
+        return existing["result_id"]
+
+    track_ops, artist_ops, track_refs = {}, {}, []
+    for track in record.get("tracks_used", []):
+        track_ref, details, artist_ref, artist = split_track(track)
+        track_refs.append(track_ref)
+        track_ops[track_ref] = UpdateOne({"_id": track_ref}, {"$setOnInsert": details}, upsert=True)
+        if artist_ref:
+            artist_ops[artist_ref] = UpdateOne({"_id": artist_ref}, {"$setOnInsert": artist}, upsert=True)
+    if artist_ops:
+        await artists_collection().bulk_write(list(artist_ops.values()), ordered=False)
+    if track_ops:
+        await tracks_collection().bulk_write(list(track_ops.values()), ordered=False)
+
+    doc = {key: value for key, value in record.items() if key != "tracks_used"}
+    doc.update({"content_hash": record_hash, "track_refs": track_refs, "storage": "compact"})
+    try:
+        await results_collection().insert_one(doc)
+    except DuplicateKeyError:
+        # Lost a race with an identical concurrent save
+        existing = await results_collection().find_one({"content_hash": record_hash}, {"result_id": 1})
+        if not existing:
+            raise
+        return existing["result_id"]
+    return record["result_id"]
+
+
+async def _rehydrate(doc: Dict) -> Dict:
+    track_refs: List[str] = doc.pop("track_refs", [])
+    doc.pop("content_hash", None)
+    doc.pop("storage", None)
+    tracks = {
+        track.pop("_id"): track
+        async for track in tracks_collection().find({"_id": {"$in": list(set(track_refs))}})
+    }
+    artist_refs = list({track.get("artist_ref") for track in tracks.values() if track.get("artist_ref")})
+    artist_details = {}
+    if artist_refs:
+        artist_details = {
+            artist.pop("_id"): artist
+            async for artist in artists_collection().find({"_id": {"$in": artist_refs}})
+        }
+    tracks_used = []
+    for ref in track_refs:
+        track = dict(tracks.get(ref, {}))
+        artist_ref = track.pop("artist_ref", None)
+        track.update(artist_details.get(artist_ref, {}))
+        tracks_used.append(track)
+    doc["tracks_used"] = tracks_used
+    return doc
+
+
+async def save_result(record: Dict) -> str:
+    if RESULT_STORAGE_MODE == "compact":
+        result_id = await _save_compact(record)
+    else:
+        await results_collection().insert_one(record)
+        result_id = record["result_id"]
+    # Only new results count towards the stats (compact saves may dedupe)
+    if result_id == record["result_id"]:
+        try:
+            await stats_store.record_result(record)
+        except Exception as e:
+            logger.error("Could not update result stats: %s", e)
+    return result_id
+
+
+# Top-level fields a reader can ask for with ?fields=
+RESULT_FIELDS = ("result_id", "mbti", "summary", "breakdown", "tracks_used", "user", "spotify_id", "mbti_state")
+
+
+def _projection(fields: Optional[List[str]]) -> Dict:
+    projection = {"_id": 0}
+    if fields:
+        projection.update({field: 1 for field in fields})
+        if "tracks_used" in fields:
+            # Compact documents rebuild tracks_used from their track refs
+            projection.update({"track_refs": 1, "storage": 1})
+    return projection
+
+
+async def _load_result(result_id: str, fields: Optional[List[str]] = None) -> Optional[Dict]:
+    doc = await results_collection().find_one({"result_id": result_id}, _projection(fields))
+    if doc and doc.get("storage") == "compact":
+        doc = await _rehydrate(doc)
+    return doc
+
+
+async def get_result(result_id: str, fields: Optional[List[str]] = None) -> Optional[Dict]:
+    if not fields:
+        return await result_cache.get_or_set(result_id, lambda: _load_result(result_id))
+    # A cached full document already has every field: no need for Mongo
+    full = await result_cache.peek(result_id)
+    if full is not None:
+        return {field: full[field] for field in fields if field in full}
+    fields = sorted(set(fields))
+    return await result_cache.get_or_set(
+        f"{result_id}?fields={','.join(fields)}",
+        lambda: _load_result(result_id, fields),
+    )
@@ -0,0 +1,256 @@
+import os
+import time
+import random
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, Optional
+
+import httpx
+
+from metrics import Counter
+
+# --- UPSTREAM SCHEDULER ---
+# Every upstream call goes through a per-upstream policy:
+#   - a token bucket that caps the request rate for the whole worker, and is
+#     paused for the Retry-After window when the upstream answers 429;
+#   - a semaphore bounding concurrent in-flight calls;
+#   - retries on 429/5xx/transport errors with full-jitter backoff that honor
+#     Retry-After, all within a per-call time budget;
+#   - a circuit breaker that fails fast after repeated failures so callers can
+#     fall back (e.g. to a cached or canned summary) right away.
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+# name: (rate/s, burst, max concurrency, max retries, retry budget s), each
+# overridable with <NAME>_RATE_LIMIT, _BURST, _MAX_CONCURRENCY, _MAX_RETRIES
+# and _RETRY_BUDGET. Lyrics are cached (misses included), so only cold
+# lookups reach SomeRandomAPI; its limit leaves room for a burst of users.
+DEFAULT_POLICIES = {
+    "spotify": (20.0, 40, 32, 2, 5.0),
+    "lyrics": (20.0, 40, 16, 1, 3.0),
+    "openrouter": (10.0, 20, 16, 1, 10.0),
+}
+BREAKER_THRESHOLD = int(os.getenv("UPSTREAM_BREAKER_THRESHOLD", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("UPSTREAM_BREAKER_RESET", "30"))
+BACKOFF_BASE = float(os.getenv("UPSTREAM_BACKOFF_BASE", "0.2"))
+BACKOFF_MAX = float(os.getenv("UPSTREAM_BACKOFF_MAX", "2"))
+
+UPSTREAM_RETRIES = Counter(
+    "typetune_upstream_retries_total",
+    "Upstream call retries by upstream and reason.",
+    ("upstream", "reason"),
+)
+UPSTREAM_REJECTED = Counter(
+    "typetune_upstream_rejected_total",
+    "Upstream calls rejected locally (open circuit or exhausted rate budget).",
+    ("upstream", "reason"),
+)
+
+
+class UpstreamUnavailable(Exception):
+    # retry_after: seconds until a retry may succeed, for Retry-After headers
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(UpstreamUnavailable):
+    pass
+
+
+class RateLimitedError(UpstreamUnavailable):
+    pass
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def available(self) -> float:
+        now = time.monotonic()
+        self._refill(now)
+        return 0.0 if self.paused_until > now else self.tokens
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    async def acquire(self, max_wait: float):
+        # Reserve a token now (tokens may go negative) and sleep until it is
+        # due, so concurrent callers queue up fairly without a lock.
+        now = time.monotonic()
+        self._refill(now)
+        wait = max(self.paused_until - now, 0.0)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        if wait > max_wait:
+            raise RateLimitedError(f"rate limit wait of {wait:.1f}s exceeds budget", retry_after=wait)
+        self.tokens -= 1
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class CircuitBreaker:
+    def __init__(self, threshold: int, reset_seconds: float):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        # Half-open: after the reset window let a single probe call through
+        if not self.probing and time.monotonic() - self.opened_at >= self.reset_seconds:
+            self.probing = True
+            return True
+        return False
+
+    def retry_in(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(self.reset_seconds - (time.monotonic() - self.opened_at), 0.0)
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.probing = False
+        if self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+    def release(self):
+        # A call that ended without an upstream answer (cancelled, or turned
+        # away locally) must not leave the breaker half-open for good
+        self.probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if self.probing else "open"
+
+
+def _retry_after(response: Optional[httpx.Response]) -> Optional[float]:
+    if response is None:
+        return None
+    value = response.headers.get("Retry-After")
+    try:
+        return max(float(value), 0.0) if value is not None else None
+    except ValueError:
+        return None
+
+
+class UpstreamPolicy:
+    def __init__(self, name: str):
+        rate, burst, concurrency, retries, budget = DEFAULT_POLICIES[name]
+        prefix = name.upper()
+        self.name = name
+        self.bucket = TokenBucket(
+            float(os.getenv(f"{prefix}_RATE_LIMIT", rate)),
+            int(os.getenv(f"{prefix}_BURST", burst)),
+        )
+        self.semaphore = asyncio.Semaphore(int(os.getenv(f"{prefix}_MAX_CONCURRENCY", concurrency)))
+        self.max_retries = int(os.getenv(f"{prefix}_MAX_RETRIES", retries))
+        self.retry_budget = float(os.getenv(f"{prefix}_RETRY_BUDGET", budget))
+        self.breaker = CircuitBreaker(BREAKER_THRESHOLD, BREAKER_RESET_SECONDS)
+
+    def has_spare(self, reserve: float) -> bool:
+        # For optional background calls: only when the circuit is closed and
+        # more than reserve (a fraction of the burst) tokens are left over,
+        # so they never take capacity interactive requests are waiting for
+        return self.breaker.state == "closed" and self.bucket.available() > self.bucket.capacity * reserve
+
+    def _admit(self):
+        if not self.breaker.allow():
+            UPSTREAM_REJECTED.inc(upstream=self.name, reason="circuit_open")
+            raise CircuitOpenError(f"{self.name} circuit is open", retry_after=self.breaker.retry_in())
+
+    async def _acquire(self, deadline: float):
+        try:
+            await self.bucket.acquire(max_wait=max(deadline - time.monotonic(), 0.0))
+        except RateLimitedError:
+            UPSTREAM_REJECTED.inc(upstream=self.name, reason="rate_limited")
+            raise
+
+    def _abandon(self, error: BaseException):
+        # Unexpected errors from send() count as failures; cancellation and
+        # local rate limiting only free the half-open probe slot.
+        if isinstance(error, Exception) and not isinstance(error, RateLimitedError):
+            self.breaker.record_failure()
+        else:
+            self.breaker.release()
+
+    async def call(self, send: Callable[[], Awaitable[httpx.Response]]) -> httpx.Response:
+        self._admit()
+        deadline = time.monotonic() + self.retry_budget
+        attempt = 0
+        settled = False
+        try:
+            while True:
+                await self._acquire(deadline)
+                response, error = None, None
+                async with self.semaphore:
+                    try:
+                        response = await send()
+                    except httpx.TransportError as e:
+                        error = e
+                if response is not None and response.status_code not in RETRYABLE_STATUSES:
+                    settled = True
+                    self.breaker.record_success()
+                    return response
+
+                retry_after = _retry_after(response)
+                if response is not None and response.status_code == 429:
+                    # The upstream limit is app-wide: hold back every caller
+                    self.bucket.pause(retry_after if retry_after is not None else BACKOFF_MAX)
+                delay = retry_after if retry_after is not None else random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+                if attempt >= self.max_retries or time.monotonic() + delay > deadline:
+                    settled = True
+                    self.breaker.record_failure()
+                    if error is not None:
+                        raise error
+                    return response
+                attempt += 1
+                UPSTREAM_RETRIES.inc(upstream=self.name, reason=str(response.status_code) if response is not None else "transport")
+                await asyncio.sleep(delay)
+        except BaseException as e:
+            if not settled:
+                self._abandon(e)
+            raise
+
+    @asynccontextmanager
+    async def stream_slot(self):
+        # Admission for streaming calls, which cannot be retried mid-stream:
+        # breaker check, one rate token and a concurrency slot for the whole
+        # stream. Failures still count towards the breaker.
+        self._admit()
+        try:
+            await self._acquire(time.monotonic() + self.retry_budget)
+            async with self.semaphore:
+                yield
+        except BaseException as e:
+            self._abandon(e)
+            raise
+        else:
+            self.breaker.record_success()
+
+_policies: Dict[str, UpstreamPolicy] = {}
+
+
+def get_policy(name: str) -> UpstreamPolicy:
+    policy = _policies.get(name)
+    if policy is None:
+        policy = _policies[name] = UpstreamPolicy(name)
+    return policy
@@ -0,0 +1,43 @@
+import time
+import logging
+from contextlib import contextmanager
+from typing import Dict
+
+from metrics import Gauge
+
+# --- STARTUP REPORT ---
+# Wall time of each cold-start phase (module imports, lifespan init and the
+# background warm-up), so cold-start cost can be tracked over time. Logged
+# once warm-up finishes and exposed via GET /startup and /metrics.
+
+logger = logging.getLogger("typetune.startup")
+
+STARTUP_SECONDS = Gauge(
+    "typetune_startup_seconds",
+    "Duration of each cold-start phase (imports, init, warm-up).",
+    ("phase",),
+)
+
+_phases: Dict[str, float] = {}
+
+
+def record(phase: str, seconds: float):
+    _phases[phase] = round(seconds, 4)
+    STARTUP_SECONDS.set(seconds, phase=phase)
+
+
+@contextmanager
+def timed(phase: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(phase, time.perf_counter() - start)
+
+
+def report() -> Dict[str, float]:
+    return dict(_phases)
+
+
+def log_report():
+    logger.info("Startup phases (s): %s", ", ".join(f"{phase}={seconds}" for phase, seconds in _phases.items()))
@@ -0,0 +1,138 @@
+import os
+import re
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from cache import make_cache
+from mongo import get_async_db
+
+# --- MBTI DISTRIBUTION STATS ---
+# One small document per MBTI type in db.result_stats holding a result
+# count, running sums of the breakdown values and genre counts. save_result
+# bumps them with a single $inc upsert, so /stats reads at most 16 documents
+# (served from a short-lived cached snapshot) instead of aggregating every
+# stored result. rebuild_stats.py recomputes them from db.results.
+
+STATS_CACHE_TTL = float(os.getenv("STATS_CACHE_TTL", "60"))
+STATS_TOP_GENRES = int(os.getenv("STATS_TOP_GENRES", "5"))
+
+SNAPSHOT_KEY = "snapshot"
+
+# breakdown key -> stats field
+BREAKDOWN_FIELDS = {
+    "avg_track_popularity": "avg_track_popularity",
+    "avg_duration_ms": "avg_duration_ms",
+    "avg_artist_popularity": "avg_artist_popularity",
+}
+AXIS_FIELDS = {"E vs I": "ei_value", "S vs N": "sn_value", "T vs F": "tf_value", "J vs P": "jp_value"}
+
+_mbti_pattern = re.compile(r"^[EI][SN][TF][JP]$")
+
+stats_cache = make_cache("stats", STATS_CACHE_TTL, 4, backend="memory")
+
+
+def stats_collection():
+    return get_async_db().get_collection("result_stats")
+
+
+def _number(value) -> Optional[float]:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return None
+
+
+def _genre_field(genre: str) -> str:
+    # Mongo field names cannot contain "." or start with "$"
+    return genre.replace(".", "․").replace("$", "＄")
+
+
+def _genre_name(field: str) -> str:
+    return field.replace("․", ".").replace("＄", "$")
+
+
+def increments(record: Dict) -> Optional[Dict]:
+    # $inc document for one saved result, or None if it has no valid type
+    mbti = record.get("mbti")
+    if not isinstance(mbti, str) or not _mbti_pattern.match(mbti):
+        return None
+    breakdown = record.get("breakdown") or {}
+    inc = {"count": 1}
+    for key, field in BREAKDOWN_FIELDS.items():
+        value = _number(breakdown.get(key))
+        if value is not None:
+            inc[f"sums.{field}"] = value
+            inc[f"counts.{field}"] = 1
+    logic = breakdown.get("mbti_logic") or {}
+    for axis, field in AXIS_FIELDS.items():
+        value = _number((logic.get(axis) or {}).get("value"))
+        if value is not None:
+            inc[f"sums.{field}"] = value
+            inc[f"counts.{field}"] = 1
+    # dict.fromkeys dedupes in order, so most_common ties stay stable
+    for genre in dict.fromkeys(breakdown.get("top_genres") or []):
+        if isinstance(genre, str) and genre:
+            inc[f"genre_counts.{_genre_field(genre)}"] = 1
+    return inc
+
+
+async def record_result(record: Dict):
+    inc = increments(record)
+    if inc is None:
+        return
+    update = {"$inc": inc, "$set": {"updated_at": datetime.now(timezone.utc)}}
+    await stats_collection().update_one({"_id": record["mbti"]}, update, upsert=True)
+
+
+def type_stats(doc: Dict, total: int) -> Dict:
+    sums, counts = doc.get("sums", {}), doc.get("counts", {})
+    genres = Counter({_genre_name(field): n for field, n in doc.get("genre_counts", {}).items()})
+    return {
+        "count": doc.get("count", 0),
+        "share": round(doc.get("count", 0) / total, 4) if total else 0.0,
+        "averages": {
+            field: round(sums[field] / counts[field], 2)
+            for field in sums if counts.get(field)
+        },
+        "top_genres": [genre for genre, _ in genres.most_common(STATS_TOP_GENRES)],
+    }
+
+
+async def _load_snapshot() -> Dict:
+    docs = [doc async for doc in stats_collection().find({})]
+    total = sum(doc.get("count", 0) for doc in docs)
+    types = {doc["_id"]: type_stats(doc, total) for doc in docs if doc.get("count", 0) > 0}
+    return {
+        "total": total,
+        "types": dict(sorted(types.items(), key=lambda item: -item[1]["count"])),
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+async def get_stats() -> Dict:
+    return await stats_cache.get_or_set(SNAPSHOT_KEY, _load_snapshot)
+
+
+async def rebuild() -> Dict[str, int]:
+    # Recompute every type document from db.results. Saves that land while
+    # this runs may be counted twice or not at all, so run it when quiet.
+    totals: Dict[str, Dict] = {}
+    results = get_async_db().get_collection("results")
+    async for doc in results.find({}, {"_id": 0, "mbti": 1, "breakdown": 1}):
+        inc = increments(doc)
+        if inc is None:
+            continue
+        stats = totals.setdefault(doc["mbti"], {})
+        for path, value in inc.items():
+            stats[path] = stats.get(path, 0) + value
+
+    now = datetime.now(timezone.utc)
+    for mbti, stats in totals.items():
+        nested = {"updated_at": now}
+        for path, value in stats.items():
+            parent, _, leaf = path.rpartition(".")
+            (nested.setdefault(parent, {}) if parent else nested)[leaf] = value
+        await stats_collection().replace_one({"_id": mbti}, nested, upsert=True)
+    await stats_collection().delete_many({"_id": {"$nin": list(totals)}})
+    await stats_cache.delete(SNAPSHOT_KEY)
+    return {mbti: stats["count"] for mbti, stats in totals.items()}
@@ -0,0 +1,259 @@
+import os
+import re
+import logging
+from typing import AsyncIterator, List, Optional, Tuple
+
+import upstream
+from cache import make_cache
+from metrics import Histogram
+
+# --- LLM SUMMARIES (OpenRouter) ---
+logger = logging.getLogger("typetune.summaries")
+
+OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
+OPENROUTER_MODEL = os.getenv("OPENROUTER_MODEL", "openrouter/horizon-beta")
+
+# Bump these whenever a prompt changes so cached summaries written with the
+# old wording are no longer served.
+SONG_PROMPT_VERSION = "2"
+ARTIST_PROMPT_VERSION = "1"
+
+SUMMARY_CACHE_TTL = float(os.getenv("SUMMARY_CACHE_TTL", str(7 * 24 * 3600)))
+SUMMARY_CACHE_MAX_ENTRIES = int(os.getenv("SUMMARY_CACHE_MAX_ENTRIES", "5000"))
+
+summary_cache = make_cache("summary", SUMMARY_CACHE_TTL, SUMMARY_CACHE_MAX_ENTRIES)
+
+
+def song_cache_key(track_id: str, has_lyrics: bool) -> str:
+    # Summaries written without lyrics are keyed separately so a temporary
+    # lyrics miss does not pin a lyric-less summary for the whole TTL.
+    source = "lyrics" if has_lyrics else "nolyrics"
+    return f"song:{track_id}:{source}:{SONG_PROMPT_VERSION}:{OPENROUTER_MODEL}"
+
+
+def artist_cache_key(artist_id: str) -> str:
+    return f"artist:{artist_id}:{ARTIST_PROMPT_VERSION}:{OPENROUTER_MODEL}"
+
+
+def build_artist_payload(artist_name: str, input_text: str) -> dict:
+    prompt = (
+        f"Using the following info, write a short ~100-word biography of the musical artist '{artist_name}'. "
+        f"Focus on genre, background, notable achievements, and overall style. Make it sound casual, music-savvy, "
+        f"and human — like something from a fan blog or artist spotlight.\n\n"
+        f"INFO:\n{input_text}"
+    )
+    return {
+        "model": OPENROUTER_MODEL,
+        "messages": [
+            {"role": "system", "content": "You are a helpful music expert."},
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": 0.7,
+        "max_tokens": 300
+    }
+
+
+# --- LYRICS COMPACTION ---
+# Lyrics are compacted before they go into the prompt: whitespace is
+# normalized, repeated sections (choruses) and runs of identical lines are
+# collapsed, and the result is cut to LYRICS_TOKEN_BUDGET estimated tokens
+# (0 disables the cut). Token counts before/after are recorded in /metrics.
+LYRICS_COMPACTION = os.getenv("LYRICS_COMPACTION", "true").lower() in ("1", "true", "yes")
+LYRICS_TOKEN_BUDGET = int(os.getenv("LYRICS_TOKEN_BUDGET", "600"))
+
+PROMPT_TOKENS = Histogram(
+    "typetune_prompt_lyrics_tokens",
+    "Estimated lyrics tokens per song prompt, before and after compaction.",
+    ("stage",),
+    buckets=(50, 100, 200, 400, 800, 1600, 3200, 6400),
+)
+
+_words = re.compile(r"\w+|[^\w\s]")
+_spaces = re.compile(r"[ \t\u00a0]+")
+_section_header = re.compile(r"^\[.*\]$")
+
+
+def estimate_tokens(text: str) -> int:
+    # Cheap stand-in for a real tokenizer: BPE vocabularies average about
+    # four characters or three quarters of a word per token.
+    if not text:
+        return 0
+    return max(len(text) // 4, len(_words.findall(text)) * 4 // 3)
+
+
+def _sections(lines: List[str]) -> List[List[str]]:
+    sections, current = [], []
+    for line in lines:
+        if not line or _section_header.match(line):
+            if current:
+                sections.append(current)
+            current = [line] if line else []
+        else:
+            current.append(line)
+    if current:
+        sections.append(current)
+    return sections
+
+
+def _collapse_runs(lines: List[str]) -> List[str]:
+    collapsed = []
+    for line in lines:
+        if collapsed and collapsed[-1][0] == line:
+            collapsed[-1][1] += 1
+        else:
+            collapsed.append([line, 1])
+    return [line if count == 1 else f"{line} (x{count})" for line, count in collapsed]
+
+
+def _cut_line(line: str, budget: int) -> str:
+    # Longest word prefix of line whose estimate fits budget; a single word
+    # too long for it is cut by characters, so something always remains.
+    words = line.split()
+    low, high = 0, len(words)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if estimate_tokens(" ".join(words[:mid])) <= budget:
+            low = mid
+        else:
+            high = mid - 1
+    if low:
+        return " ".join(words[:low])
+    return words[0][:max(1, budget * 4)] if words else ""
+
+
+def compact_lyrics(lyrics: str, budget: int = LYRICS_TOKEN_BUDGET) -> str:
+    lines = [_spaces.sub(" ", line).strip() for line in lyrics.replace("\r\n", "\n").split("\n")]
+    seen, kept = set(), []
+    for section in _sections(lines):
+        header = section[0] if _section_header.match(section[0]) else None
+        body = section[1:] if header else section
+        fingerprint = "\n".join(body).casefold()
+        if body and fingerprint in seen:
+            # Repeated chorus/verse: keep only a marker where it recurs
+            if header:
+                kept.append([f"{header} (repeat)"])
+            continue
+        seen.add(fingerprint)
+        kept.append(([header] if header else []) + _collapse_runs(body))
+
+    out, used, has_lyrics = [], 0, False
+    for section in kept:
+        for line in section:
+            cost = estimate_tokens(line) + 1
+            if budget > 0 and used + cost > budget:
+                if not has_lyrics and _section_header.match(line):
+                    continue  # no room for headers before the first lyric
+                # Keep the part of the line that still fits (at least a word
+                # when no lyric line has been kept yet) rather than dropping it
+                part = _cut_line(line, budget - used - 1)
+                if part and (not has_lyrics or used + estimate_tokens(part) + 1 <= budget):
+                    out.append(part)
+                out.append("[...]")
+                return "\n".join(out).strip()
+            out.append(line)
+            used += cost
+            has_lyrics = has_lyrics or not _section_header.match(line)
+        out.append("")
+    return "\n".join(out).strip()
+
+
+def prepare_lyrics(lyrics: str) -> str:
+    if not LYRICS_COMPACTION:
+        return lyrics
+    compacted = compact_lyrics(lyrics)
+    PROMPT_TOKENS.observe(estimate_tokens(lyrics), stage="raw")
+    PROMPT_TOKENS.observe(estimate_tokens(compacted), stage="compacted")
+    return compacted
+
+
+def build_song_payload(title: str, artist: str, lyrics: Optional[str], genres: Optional[list]) -> dict:
+    prompt = (
+        f"Song Title: {title}\n"
+        f"Artist: {artist}\n"
+    )
+    if genres:
+        prompt += f"Genres: {', '.join(genres)}\n"
+    if lyrics:
+        prompt += (
+            f"Lyrics:\n{prepare_lyrics(lyrics)}\n\n"
+            f"Based on the lyrics above, give a ~100 word summary of the song's main theme, mood, and possible message or story. "
+            f"If the lyrics are in a foreign language, infer the meaning if possible. "
+            f"Mention any connection to the artist's known style or background if relevant. "
+            f"Write like a music journalist, with clarity and insight, for a general audience."
+        )
+    else:
+        prompt += (
+            "No lyrics were found for this song. Based on the title, artist, and genre(s), "
+            "write a ~100 word summary of what the song could be about or the kind of mood and themes it might have. "
+            "If the artist is known for particular styles or stories, include that context."
+        )
+    return {
+        "model": OPENROUTER_MODEL,
+        "messages": [
+            {"role": "system", "content": "You are a helpful and insightful music journalist."},
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": 0.7,
+        "max_tokens": 300
+    }
+
+
+async def summarize_artist_info(artist_name: str, input_text: str) -> str:
+    payload = build_artist_payload(artist_name, input_text)
+    logger.debug("[summarize_artist_info] Sending request to OpenRouter, prompt: %.200s", payload["messages"][1]["content"])
+    resp = await upstream.openrouter_post(payload, OPENROUTER_API_KEY)
+    logger.debug("[summarize_artist_info] Response status: %s", resp.status_code)
+    resp.raise_for_status()
+    data = resp.json()
+    return data["choices"][0]["message"]["content"]
+
+
+async def summarize_song_lyrics(title: str, artist: str, lyrics: Optional[str], genres: Optional[list]) -> str:
+    payload = build_song_payload(title, artist, lyrics, genres)
+    resp = await upstream.openrouter_post(payload, OPENROUTER_API_KEY)
+    resp.raise_for_status()
+    return resp.json()["choices"][0]["message"]["content"]
+
+
+# --- CACHED SUMMARIES ---
+# Summaries are identical for every user, so they are cached per track/artist
+# and concurrent misses for the same key share one OpenRouter call.
+async def cached_song_summary(track_id: str, title: str, artist: str, lyrics: Optional[str], genres: Optional[list]) -> str:
+    return await summary_cache.get_or_set(
+        song_cache_key(track_id, bool(lyrics)),
+        lambda: summarize_song_lyrics(title, artist, lyrics, genres),
+    )
+
+
+async def cached_artist_summary(artist_id: str, artist_name: str, input_text: str) -> str:
+    return await summary_cache.get_or_set(
+        artist_cache_key(artist_id),
+        lambda: summarize_artist_info(artist_name, input_text),
+    )
+
+
+# --- STREAMED SUMMARIES ---
+# Yield (event, data) pairs for SSE endpoints: "token" events while the
+# completion streams in, then one final "summary" event with the full text.
+# A cache hit skips straight to the final event.
+async def _stream_summary(key: str, payload: dict) -> AsyncIterator[Tuple[str, dict]]:
+    cached = await summary_cache.get(key)
+    if cached is not None:
+        yield "summary", {"summary": cached, "cached": True}
+        return
+    parts = []
+    async for content in upstream.openrouter_stream(payload, OPENROUTER_API_KEY):
+        parts.append(content)
+        yield "token", {"content": content}
+    summary = "".join(parts)
+    if summary:
+        await summary_cache.set(key, summary)
+    yield "summary", {"summary": summary, "cached": False}
+
+
+def stream_song_summary(track_id: str, title: str, artist: str, lyrics: Optional[str], genres: Optional[list]):
+    return _stream_summary(song_cache_key(track_id, bool(lyrics)), build_song_payload(title, artist, lyrics, genres))
+
+
+def stream_artist_summary(artist_id: str, artist_name: str, input_text: str):
+    return _stream_summary(artist_cache_key(artist_id), build_artist_payload(artist_name, input_text))
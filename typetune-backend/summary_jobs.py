@@ -0,0 +1,343 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set
+from uuid import uuid4
+
+import summaries
+from cache import get_redis
+from metrics import Counter
+
+# --- SUMMARY JOB QUEUE ---
+# LLM summaries as background jobs: submit() answers right away with a job id
+# and a fixed pool of workers runs the OpenRouter calls, so slow completions
+# never hold an HTTP worker. Results land in the shared summary cache too.
+# Jobs for a summary that is already cached finish immediately, and a job
+# that is still pending is reused for the same summary. The default backend is
+# in-process; SUMMARY_JOB_BACKEND=redis shares the queue and job state
+# between app processes. There a worker pops a job by moving it onto a
+# processing list and removes it once the job is finished, so jobs whose
+# worker died can be found: a reaper puts popped-but-never-started jobs back
+# on the queue, and a job still running past SUMMARY_JOB_TIMEOUT is failed.
+
+SUMMARY_JOB_BACKEND = os.getenv("SUMMARY_JOB_BACKEND", "memory").lower()
+SUMMARY_JOB_WORKERS = int(os.getenv("SUMMARY_JOB_WORKERS", "4"))
+SUMMARY_JOB_QUEUE_SIZE = int(os.getenv("SUMMARY_JOB_QUEUE_SIZE", "1000"))
+SUMMARY_JOB_TIMEOUT = float(os.getenv("SUMMARY_JOB_TIMEOUT", "60"))
+# How long finished jobs stay pollable
+SUMMARY_JOB_TTL = float(os.getenv("SUMMARY_JOB_TTL", "3600"))
+# Expected worst-case wait in the queue before a worker picks a job up
+SUMMARY_JOB_MAX_QUEUE_WAIT = float(os.getenv("SUMMARY_JOB_MAX_QUEUE_WAIT", "30"))
+# Slack on top of SUMMARY_JOB_TIMEOUT before a running job counts as lost
+SUMMARY_JOB_GRACE = float(os.getenv("SUMMARY_JOB_GRACE", "5"))
+SUMMARY_JOB_REAP_INTERVAL = float(os.getenv("SUMMARY_JOB_REAP_INTERVAL", "10"))
+
+SONG = "song"
+ARTIST = "artist"
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+SUMMARY_JOBS = Counter(
+    "typetune_summary_jobs_total",
+    "Summary jobs by kind and outcome (queued, reused, cached, done, failed, rejected, requeued).",
+    ("kind", "outcome"),
+)
+
+logger = logging.getLogger("typetune.summary_jobs")
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+def _run_song(params: Dict):
+    return summaries.cached_song_summary(params["track_id"], params["title"], params["artist"], params["lyrics"], params["genres"])
+
+
+def _run_artist(params: Dict):
+    return summaries.cached_artist_summary(params["artist_id"], params["artist_name"], params["input_text"])
+
+
+RUNNERS = {SONG: _run_song, ARTIST: _run_artist}
+
+
+class MemoryJobBackend:
+    def __init__(self):
+        self._jobs: "OrderedDict[str, tuple]" = OrderedDict()
+        self._active: Dict[str, str] = {}
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=SUMMARY_JOB_QUEUE_SIZE)
+
+    async def save(self, job: Dict):
+        self._jobs[job["job_id"]] = (time.monotonic() + SUMMARY_JOB_TTL, job)
+        self._jobs.move_to_end(job["job_id"])
+        # Oldest entries expire first, so pruning can stop at the first live one
+        now = time.monotonic()
+        while self._jobs:
+            expires_at, _ = next(iter(self._jobs.values()))
+            if expires_at > now:
+                break
+            self._jobs.popitem(last=False)
+
+    async def load(self, job_id: str) -> Optional[Dict]:
+        entry = self._jobs.get(job_id)
+        if entry is None or entry[0] <= time.monotonic():
+            return None
+        return dict(entry[1])
+
+    async def claim(self, key: str, job_id: str) -> Optional[str]:
+        # Returns the id of a pending job for the same key, if there is one
+        existing = self._active.get(key)
+        if existing is not None:
+            return existing
+        self._active[key] = job_id
+        return None
+
+    async def release(self, key: str):
+        self._active.pop(key, None)
+
+    async def push(self, job_id: str):
+        try:
+            self._queue.put_nowait(job_id)
+        except asyncio.QueueFull:
+            raise JobQueueFull("summary job queue is full")
+
+    async def pop(self) -> Optional[str]:
+        return await self._queue.get()
+
+    # Jobs die with the process here, so there is nothing to recover
+    async def ack(self, job_id: str) -> bool:
+        return True
+
+    async def processing(self) -> List[str]:
+        return []
+
+    async def requeue(self, job_id: str) -> bool:
+        return False
+
+
+class RedisJobBackend:
+    def _job_key(self, job_id):
+        return f"typetune:summary_job:{job_id}"
+
+    def _active_key(self, key):
+        return f"typetune:summary_job_active:{key}"
+
+    QUEUE_KEY = "typetune:summary_jobs"
+    PROCESSING_KEY = "typetune:summary_jobs_processing"
+
+    async def save(self, job: Dict):
+        await get_redis().set(self._job_key(job["job_id"]), json.dumps(job), ex=max(1, int(SUMMARY_JOB_TTL)))
+
+    async def load(self, job_id: str) -> Optional[Dict]:
+        raw = await get_redis().get(self._job_key(job_id))
+        return json.loads(raw) if raw is not None else None
+
+    async def claim(self, key: str, job_id: str) -> Optional[str]:
+        # The claim expires on its own in case the worker holding it dies
+        claimed = await get_redis().set(self._active_key(key), job_id, nx=True, ex=max(1, int(SUMMARY_JOB_TIMEOUT * 2)))
+        if claimed:
+            return None
+        return await get_redis().get(self._active_key(key))
+
+    async def release(self, key: str):
+        await get_redis().delete(self._active_key(key))
+
+    async def push(self, job_id: str):
+        if await get_redis().llen(self.QUEUE_KEY) >= SUMMARY_JOB_QUEUE_SIZE:
+            raise JobQueueFull("summary job queue is full")
+        await get_redis().lpush(self.QUEUE_KEY, job_id)
+
+    async def pop(self) -> Optional[str]:
+        # Atomically moved onto the processing list, so a job is never lost
+        # between the pop and its first save. Short blocking pops so workers
+        # notice cancellation at shutdown.
+        return await get_redis().blmove(self.QUEUE_KEY, self.PROCESSING_KEY, 1, src="RIGHT", dest="LEFT")
+
+    async def ack(self, job_id: str) -> bool:
+        # False if it was already taken off the list (e.g. by a reaper)
+        return bool(await get_redis().lrem(self.PROCESSING_KEY, 1, job_id))
+
+    async def processing(self) -> List[str]:
+        return await get_redis().lrange(self.PROCESSING_KEY, 0, -1)
+
+    async def requeue(self, job_id: str) -> bool:
+        # Back on the consuming end of the queue, so it runs next
+        if not await self.ack(job_id):
+            return False
+        await get_redis().rpush(self.QUEUE_KEY, job_id)
+        return True
+
+
+_backend = None
+_workers: List[asyncio.Task] = []
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend = RedisJobBackend() if SUMMARY_JOB_BACKEND == "redis" else MemoryJobBackend()
+    return _backend
+
+
+def cache_key(kind: str, params: Dict) -> str:
+    if kind == SONG:
+        return summaries.song_cache_key(params["track_id"], bool(params["lyrics"]))
+    return summaries.artist_cache_key(params["artist_id"])
+
+
+def public_job(job: Dict) -> Dict:
+    return {key: job.get(key) for key in ("job_id", "kind", "status", "summary", "error")}
+
+
+async def submit(kind: str, params: Dict) -> Dict:
+    backend = get_backend()
+    key = cache_key(kind, params)
+    job = {
+        "job_id": str(uuid4()), "kind": kind, "status": QUEUED, "summary": None, "error": None,
+        "queued_at": time.time(), "started_at": None,
+    }
+
+    cached = await summaries.summary_cache.get(key)
+    if cached is not None:
+        job.update(status=DONE, summary=cached)
+        await backend.save(job)
+        SUMMARY_JOBS.inc(kind=kind, outcome="cached")
+        return public_job(job)
+
+    existing_id = await backend.claim(key, job["job_id"])
+    if existing_id is not None:
+        existing = await backend.load(existing_id)
+        if existing is not None:
+            SUMMARY_JOBS.inc(kind=kind, outcome="reused")
+            return public_job(existing)
+        # Stale claim (job expired): take it over
+        await backend.release(key)
+        await backend.claim(key, job["job_id"])
+
+    job.update(key=key, params=params)
+    await backend.save(job)
+    try:
+        await backend.push(job["job_id"])
+    except JobQueueFull:
+        await backend.release(key)
+        SUMMARY_JOBS.inc(kind=kind, outcome="rejected")
+        raise
+    SUMMARY_JOBS.inc(kind=kind, outcome="queued")
+    return public_job(job)
+
+
+def _is_lost(job: Dict) -> bool:
+    # Still running well past the worker's own timeout: the worker died or
+    # was cancelled mid-job. Wall-clock times, as jobs move between processes.
+    started_at = job.get("started_at") or job.get("queued_at") or 0
+    return job["status"] == RUNNING and time.time() - started_at > SUMMARY_JOB_TIMEOUT + SUMMARY_JOB_GRACE
+
+
+async def _fail_lost(job: Dict):
+    job.update(status=FAILED, error="worker lost")
+    key = job.pop("key", None)
+    job.pop("params", None)
+    await get_backend().save(job)
+    if key is not None:
+        await get_backend().release(key)
+    SUMMARY_JOBS.inc(kind=job["kind"], outcome=FAILED)
+
+
+async def get_job(job_id: str) -> Optional[Dict]:
+    job = await get_backend().load(job_id)
+    if job and _is_lost(job):
+        await _fail_lost(job)
+    return public_job(job) if job else None
+
+
+async def _run(job_id: str):
+    backend = get_backend()
+    job = await backend.load(job_id)
+    if job is None or job["status"] != QUEUED:
+        return
+    job.update(status=RUNNING, started_at=time.time())
+    await backend.save(job)
+    try:
+        summary = await asyncio.wait_for(RUNNERS[job["kind"]](job["params"]), SUMMARY_JOB_TIMEOUT)
+        job.update(status=DONE, summary=summary)
+    except asyncio.TimeoutError:
+        job.update(status=FAILED, error="timed out")
+    except Exception as e:
+        job.update(status=FAILED, error=str(e) or e.__class__.__name__)
+    SUMMARY_JOBS.inc(kind=job["kind"], outcome=job["status"])
+    # Inputs (e.g. full lyrics) are not needed once the job has finished
+    key = job.pop("key")
+    job.pop("params", None)
+    await backend.save(job)
+    await backend.release(key)
+
+
+async def _worker():
+    backend = get_backend()
+    while True:
+        try:
+            job_id = await backend.pop()
+            if job_id is not None:
+                await _run(job_id)
+                await backend.ack(job_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("Summary job worker error: %s", e)
+            await asyncio.sleep(1)
+
+
+async def reap_once(suspects: Set[str]) -> Set[str]:
+    # One pass over the processing list. Returns the popped jobs that have
+    # not started yet; if one is still unstarted on the next pass, its worker
+    # died between the pop and _run and the job goes back on the queue.
+    backend = get_backend()
+    unstarted = set()
+    for job_id in await backend.processing():
+        job = await backend.load(job_id)
+        if job is None or job["status"] in (DONE, FAILED):
+            # Expired, or finished by a worker that died before its ack
+            await backend.ack(job_id)
+        elif job["status"] == RUNNING:
+            if _is_lost(job) and await backend.ack(job_id):
+                await _fail_lost(job)
+        elif job_id in suspects:
+            if await backend.requeue(job_id):
+                SUMMARY_JOBS.inc(kind=job["kind"], outcome="requeued")
+        else:
+            unstarted.add(job_id)
+    return unstarted
+
+
+async def _reaper():
+    suspects: Set[str] = set()
+    while True:
+        await asyncio.sleep(SUMMARY_JOB_REAP_INTERVAL)
+        try:
+            suspects = await reap_once(suspects)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("Summary job reaper error: %s", e)
+
+
+def start():
+    if not _workers:
+        _workers.extend(asyncio.create_task(_worker()) for _ in range(SUMMARY_JOB_WORKERS))
+        if SUMMARY_JOB_BACKEND == "redis":
+            _workers.append(asyncio.create_task(_reaper()))
+
+
+async def stop():
+    global _backend
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+    _backend = None
@@ -0,0 +1,167 @@
+import os
+import json
+import asyncio
+from typing import AsyncIterator, Dict, Optional
+
+import httpx
+
+from metrics import record_response, upstream_span
+from scheduler import get_policy
+
+# --- UPSTREAM HTTP CLIENTS ---
+# One pooled keep-alive client per upstream. Clients are opened in the app
+# lifespan and shared by every request, so connections (and TLS sessions) are
+# reused instead of being set up again for each call.
+
+SPOTIFY = "spotify"
+LYRICS = "lyrics"
+OPENROUTER = "openrouter"
+
+BASE_URLS = {
+    SPOTIFY: os.getenv("SPOTIFY_API_BASE", "https://api.spotify.com/v1"),
+    LYRICS: os.getenv("SOMERANDOMAPI_BASE", "https://some-random-api.com"),
+    OPENROUTER: os.getenv("OPENROUTER_API_BASE", "https://openrouter.ai/api/v1"),
+}
+SPOTIFY_TOKEN_URL = os.getenv("SPOTIFY_TOKEN_URL", "https://accounts.spotify.com/api/token")
+
+# Read timeouts differ per upstream: LLM completions are much slower than
+# Spotify or lyrics lookups. Each can be overridden with <NAME>_READ_TIMEOUT.
+DEFAULT_READ_TIMEOUTS = {
+    SPOTIFY: 10.0,
+    LYRICS: 10.0,
+    OPENROUTER: 60.0,
+}
+
+HTTP2_ENABLED = os.getenv("UPSTREAM_HTTP2", "true").lower() in ("1", "true", "yes")
+CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "5"))
+POOL_TIMEOUT = float(os.getenv("UPSTREAM_POOL_TIMEOUT", "5"))
+MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_KEEPALIVE", "20"))
+KEEPALIVE_EXPIRY = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", "30"))
+
+_clients: Dict[str, httpx.AsyncClient] = {}
+_ssl_context = None
+
+
+def _build_client(name: str) -> httpx.AsyncClient:
+    global _ssl_context
+    # Loading the CA bundle is the slow part of creating a client: do it once
+    if _ssl_context is None:
+        _ssl_context = httpx.create_ssl_context()
+    read_timeout = float(os.getenv(f"{name.upper()}_READ_TIMEOUT", DEFAULT_READ_TIMEOUTS[name]))
+    return httpx.AsyncClient(
+        base_url=BASE_URLS[name],
+        http2=HTTP2_ENABLED,
+        verify=_ssl_context,
+        limits=httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(
+            read_timeout,
+            connect=CONNECT_TIMEOUT,
+            pool=POOL_TIMEOUT,
+        ),
+    )
+
+
+async def open_clients():
+    for name in BASE_URLS:
+        if name not in _clients:
+            _clients[name] = _build_client(name)
+
+
+async def close_clients():
+    clients = list(_clients.values())
+    _clients.clear()
+    await asyncio.gather(*(client.aclose() for client in clients))
+
+
+def get_client(name: str) -> httpx.AsyncClient:
+    # Clients normally come from the lifespan; fall back to creating one so
+    # code paths that run outside it (scripts, tests) still work.
+    client = _clients.get(name)
+    if client is None:
+        client = _clients[name] = _build_client(name)
+    return client
+
+
+# --- UPSTREAM HELPERS ---
+# Every call is wrapped in a metrics span labelled with the upstream and a
+# low-cardinality operation name, and scheduled through the upstream's
+# rate-limit/retry/circuit-breaker policy (scheduler.py).
+def spotify_operation(path: str) -> str:
+    parts = path.strip("/").split("/")
+    if len(parts) > 1 and parts[0] in ("tracks", "artists", "albums"):
+        return f"/{parts[0]}/{{id}}"
+    return "/" + "/".join(parts)
+
+
+async def spotify_get(path: str, token: str, params: Optional[Dict] = None) -> httpx.Response:
+    async with upstream_span(SPOTIFY, spotify_operation(path)) as span:
+        return record_response(span, await get_policy(SPOTIFY).call(lambda: get_client(SPOTIFY).get(
+            path,
+            params=params,
+            headers={"Authorization": f"Bearer {token}"},
+        )))
+
+
+async def spotify_exchange_code(data: Dict) -> httpx.Response:
+    async with upstream_span(SPOTIFY, "token") as span:
+        # Authorization codes are single-use, so the exchange is never retried
+        async with get_policy(SPOTIFY).stream_slot():
+            return record_response(span, await get_client(SPOTIFY).post(SPOTIFY_TOKEN_URL, data=data))
+
+
+async def lyrics_get(title: str, artist: str, api_key: Optional[str]) -> httpx.Response:
+    async with upstream_span(LYRICS, "/lyrics") as span:
+        return record_response(span, await get_policy(LYRICS).call(lambda: get_client(LYRICS).get(
+            "/lyrics",
+            params={"title": title, "artist": artist},
+            headers={"Authorization": api_key or ""},
+        )))
+
+
+def _openrouter_headers(api_key: Optional[str]) -> Dict:
+    return {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json",
+        "HTTP-Referer": "https://typetune.vercel.app",
+        "X-Title": "TypeTune"
+    }
+
+
+async def openrouter_post(payload: Dict, api_key: Optional[str]) -> httpx.Response:
+    async with upstream_span(OPENROUTER, "chat") as span:
+        return record_response(span, await get_policy(OPENROUTER).call(lambda: get_client(OPENROUTER).post(
+            "/chat/completions",
+            headers=_openrouter_headers(api_key),
+            json=payload,
+        )))
+
+
+async def openrouter_stream(payload: Dict, api_key: Optional[str]) -> AsyncIterator[str]:
+    # Yields completion text chunks from OpenRouter's streaming (SSE) API.
+    stream = get_client(OPENROUTER).stream(
+        "POST",
+        "/chat/completions",
+        headers=_openrouter_headers(api_key),
+        json={**payload, "stream": True},
+    )
+    async with upstream_span(OPENROUTER, "chat_stream") as span, get_policy(OPENROUTER).stream_slot(), stream as resp:
+        record_response(span, resp)
+        resp.raise_for_status()
+        async for line in resp.aiter_lines():
+            # Skip keep-alive comments (": OPENROUTER PROCESSING") and blanks
+            if not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            chunk = json.loads(data)
+            if "error" in chunk:
+                raise RuntimeError(chunk["error"].get("message", "OpenRouter stream error"))
+            content = chunk["choices"][0].get("delta", {}).get("content")
+            if content:
+                yield content